@@ -1,17 +1,32 @@
 import os  
 import streamlit as st
-import base64
-from PIL import Image
 import numpy as np
-from tflite_runtime.interpreter import Interpreter  # Utiliser l'interpréteur TFLite
+from recoplantes.adaptive import build_policy
+from recoplantes.assets import STATIC_DIR, build_assets, font_face_css, inline_file, static_url
+from recoplantes.cascade import CASCADE_STAGES, CASCADE_THRESHOLD, CascadeError, CascadeStats, predict_cascade
+from recoplantes.config import get_setting
+from recoplantes.ensemble import EnsembleError, predict_ensemble
+from recoplantes.labels import LABELS  # Classes prédites, noms affichés et recommandations (38 classes)
+from recoplantes.loader import ModelUnavailable  # Modèles TFLite chargés à la demande
+from recoplantes.metrics import METRICS, span, start_exporters, trace_request
+from recoplantes.pool import PoolTimeout
+from recoplantes.predictor import PreprocessingError, build_predictor
+from recoplantes.reload import start_watcher
+from recoplantes.tiling import heatmap_overlay
+from recoplantes.warmup import first_available, start_warmup, warmup_names
+
+# Panneau de débogage (détail de la dernière analyse) : RECO_DEBUG_PANEL=1
+DEBUG_PANEL = bool(get_setting("debug_panel", 0, int))
 
 # Fonction pour appliquer les styles personnalisés
 def set_custom_style():
     background_url = "https://raw.githubusercontent.com/AnasMba19/Reco-Plantes/main/assets/background.jpg"
+    if "background" in static_assets["images"]:
+        background_url = get_asset_src("background", None)
     st.markdown(
         f"""
         <style>
-        @import url('https://fonts.googleapis.com/css2?family=Roboto:wght@400;700&family=Montserrat:wght@600&display=swap');
+        {font_face_css(static_assets, st.get_option("server.enableStaticServing"))}
 
         /* Global style for the app */
         .stApp {{
@@ -189,397 +204,267 @@ def set_custom_style():
         unsafe_allow_html=True
     )
 
-# Fonction pour encoder l'image en base64
+# Fonction pour encoder l'image en base64 (encodée une seule fois par processus)
 def get_image_base64(image_path):
     try:
-        with open(image_path, "rb") as image_file:
-            encoded = base64.b64encode(image_file.read()).decode()
-        # Détecter le type d'image à partir de l'extension
-        ext = os.path.splitext(image_path)[1].lower()
-        if ext == ".png":
-            mime = "image/png"
-        elif ext in [".jpg", ".jpeg"]:
-            mime = "image/jpeg"
-        else:
-            mime = "image/png"  # Par défaut
-        return f"data:{mime};base64,{encoded}"
+        return inline_file(image_path)
     except Exception as e:
         st.error(f"⚠️ Erreur lors de l'encodage de l'image : {e}")
         return None
 
-# Fonction pour charger les modèles TFLite avec cache
+# Variantes WebP des images et index des polices locales, générés une seule fois par processus
 @st.cache_resource
-def load_tflite_model(model_path):
+def get_static_assets():
     try:
-        interpreter = Interpreter(model_path=model_path)
-        interpreter.allocate_tensors()
-        # st.write(f"Modèle chargé : {model_path}")  # Pour débogage
-        return interpreter
-    except Exception as e:
+        return build_assets()
+    except OSError:
+        # Dossier static/ non inscriptible : les images d'origine sont utilisées
+        return {"images": {}, "fonts": []}
+
+# Adresse d'une image : fichier statique mis en cache par le navigateur si le service
+# statique de Streamlit est actif, sinon variante WebP encodée en base64
+def get_asset_src(name, fallback_path):
+    entry = static_assets["images"].get(name)
+    if entry is None:
+        return get_image_base64(fallback_path)
+    if st.get_option("server.enableStaticServing"):
+        return static_url(entry)
+    return get_image_base64(os.path.join(STATIC_DIR, entry["file"]))
+
+# Chaîne de prédiction partagée entre les sessions : cache par contenu (image, modèle,
+# version du modèle) et gestionnaire des modèles TFLite. Chaque modèle est chargé à sa
+# première sélection (pool d'interpréteurs + micro-batching), puis conservé dans un
+# cache LRU borné en mémoire.
+@st.cache_resource
+def get_predictor():
+    return build_predictor()
+
+# Compteurs de la cascade (quelle étape répond), partagés entre les sessions
+@st.cache_resource
+def get_cascade_stats():
+    stats = CascadeStats()
+    METRICS.register_collector(stats.collect)
+    return stats
+
+# Préchauffage en arrière-plan au démarrage du processus : modèle sélectionné par défaut
+# (premier modèle disponible du manifeste), ou ceux de RECO_WARMUP_MODELS
+@st.cache_resource
+def get_warmup():
+    predictor = get_predictor()
+    names = warmup_names(predictor.manager, first=first_available(predictor.manager))
+    predictor.warmup = start_warmup(predictor.manager, names)
+    return predictor.warmup
+
+# Rechargement à chaud des fichiers .tflite remplacés (RECO_RELOAD_INTERVAL), sans redémarrage
+@st.cache_resource
+def get_model_watcher():
+    return start_watcher(get_predictor())
+
+# Politique de choix du modèle selon la charge (RECO_ADAPTIVE=1), partagée entre les sessions
+@st.cache_resource
+def get_load_policy():
+    return build_policy(get_predictor().manager)
+
+# Export des métriques (RECO_METRICS_PORT / RECO_METRICS_FILE), démarré une seule fois par processus
+@st.cache_resource
+def get_metrics_exporters():
+    return start_exporters()
+
+# Fonction pour charger un modèle TFLite à la demande
+def load_tflite_model(model_name):
+    try:
+        return model_manager.get(model_name)
+    except ModelUnavailable as e:
         st.error(f"Erreur lors du chargement du modèle TFLite : {e}")
         return None
 
-# Fonction pour prétraiter l'image
-def preprocess_image(uploaded_file, target_size):
+# Fonction pour prédire la maladie et obtenir les détails
+# Les images déjà analysées par ce modèle sont servies depuis le cache
+def predict_and_get_details(model_name, image_bytes):
     try:
-        img = Image.open(uploaded_file).convert('RGB')
-        img = img.resize(target_size)
-        img_array = np.array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0).astype(np.float32)
-        return img_array
+        # Faire la prédiction (regroupée avec celles des autres sessions) ; sous forte charge,
+        # la politique adaptative peut confier l'image à un modèle plus léger
+        if load_policy is not None:
+            prediction = load_policy.predict(predictor, model_name, image_bytes)
+        else:
+            prediction = predictor.predict(model_name, image_bytes)
+        predicted_class_idx = np.argmax(prediction.proba)
+        predicted_proba = round(100 * prediction.proba[predicted_class_idx], 2)
+        return LABELS[predicted_class_idx], predicted_proba, prediction
+    except PreprocessingError as e:
+        st.error(f"Erreur lors du prétraitement de l'image : {e}")
+        return None, 0, None
+    except PoolTimeout:
+        st.error("⚠️ Le serveur est très sollicité, veuillez réessayer dans quelques instants.")
+        return None, 0, None
     except Exception as e:
+        st.error(f"Erreur lors de la prédiction : {e}")
+        return None, 0, None
+
+# Analyse par tuiles : verdict global et carte des zones malades sur les grandes photos
+def predict_tiled_and_get_details(model_name, image_bytes):
+    try:
+        result = predictor.predict_tiled(model_name, image_bytes)
+    except PreprocessingError as e:
         st.error(f"Erreur lors du prétraitement de l'image : {e}")
-        return None
+        return None, 0, None
+    except PoolTimeout:
+        st.error("⚠️ Le serveur est très sollicité, veuillez réessayer dans quelques instants.")
+        return None, 0, None
+    except Exception as e:
+        st.error(f"Erreur lors de la prédiction : {e}")
+        return None, 0, None
+    predicted_class_idx = np.argmax(result.proba)
+    predicted_proba = round(100 * result.proba[predicted_class_idx], 2)
+    return LABELS[predicted_class_idx], predicted_proba, result
 
-# Fonction pour nettoyer les noms de classes
-def clean_class_name(class_name):
-    class_name = class_name.replace('_', ' ').replace('  ', ' ').strip()
-    class_name = class_name.replace('(including sour)', 'including sour')
-    class_name = class_name.replace('(Citrus greening)', 'Citrus greening')
-    class_name = class_name.replace('(maize)', 'maize')
-    # Ajouter d'autres remplacements si nécessaire
-    return class_name
-
-# Fonction pour obtenir les détails de la maladie
-def get_disease_details(disease_name):
-    disease_details = {
-        'Apple Apple scab': {
-            'symptoms': 'Taches brunes sur les feuilles, parfois en forme de cercle.',
-            'impact': 'Réduction de la photosynthèse et du rendement des fruits.',
-            'treatment': 'Appliquez un fongicide à base de cuivre.',
-            'prevention': 'Éliminez les feuilles infectées et améliorez la circulation de l\'air.'
-        },
-        'Apple Black rot': {
-            'symptoms': 'Taches noires et pourriture sur les feuilles et les fruits.',
-            'impact': 'Provoque la chute prématurée des fruits et réduit le rendement.',
-            'treatment': 'Appliquez un fongicide à base de cuivre ou de soufre.',
-            'prevention': 'Éliminez les parties infectées et améliorez la circulation de l\'air.'
-        },
-        'Apple Cedar apple rust': {
-            'symptoms': 'Développement de pustules orange sur les feuilles.',
-            'impact': 'Affaiblissement de la plante et réduction du rendement.',
-            'treatment': 'Utilisez des fongicides appropriés et éliminez les plants hôtes.',
-            'prevention': 'Évitez l\'humidité excessive et améliorez la circulation de l\'air.'
-        },
-        'Apple healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        },
-        'Blueberry healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        },
-        'Cherry Powdery mildew': {
-            'symptoms': 'Poudre blanche sur les feuilles et les bourgeons.',
-            'impact': 'Ralentit la croissance de la plante et réduit le rendement.',
-            'treatment': 'Appliquez des fongicides spécifiques ou des solutions à base de bicarbonate de soude.',
-            'prevention': 'Assurez une bonne circulation de l\'air et évitez l\'arrosage par le dessus.'
-        },
-        'Cherry healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        },
-        'Corn Cercospora leaf spot Gray leaf spot': {
-            'symptoms': 'Taches grises sur les feuilles avec des bords bruns.',
-            'impact': 'Réduction de la photosynthèse et du rendement.',
-            'treatment': 'Appliquez des fongicides appropriés.',
-            'prevention': 'Éliminez les résidus de culture et améliorez la rotation des cultures.'
-        },
-        'Corn Common rust': {
-            'symptoms': 'Pustules rouges sur les feuilles.',
-            'impact': 'Diminution de la photosynthèse et du rendement.',
-            'treatment': 'Appliquez des fongicides spécifiques.',
-            'prevention': 'Utilisez des variétés résistantes et pratiquez la rotation des cultures.'
-        },
-        'Corn Northern Leaf Blight': {
-            'symptoms': 'Taches longues et étroites sur les feuilles.',
-            'impact': 'Réduction de la photosynthèse et du rendement.',
-            'treatment': 'Appliquez des fongicides spécifiques.',
-            'prevention': 'Utilisez des variétés résistantes et pratiquez la rotation des cultures.'
-        },
-        'Corn healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        },
-        'Grape Black rot': {
-            'symptoms': 'Taches noires sur les feuilles, pourriture des raisins.',
-            'impact': 'Réduction de la qualité et du rendement des raisins.',
-            'treatment': 'Utilisez des fongicides spécifiques et retirez les parties infectées.',
-            'prevention': 'Assurez une bonne aération et évitez l\'excès d\'humidité.'
-        },
-        'Grape Esca Black Measles': {
-            'symptoms': 'Taches noires irrégulières sur les feuilles et les fruits.',
-            'impact': 'Affaiblissement de la plante et réduction du rendement.',
-            'treatment': 'Appliquez des fongicides et taillez les parties infectées.',
-            'prevention': 'Utilisez des variétés résistantes et améliorez la ventilation.'
-        },
-        'Grape Leaf blight Isariopsis Leaf Spot': {
-            'symptoms': 'Taches brunes sur les feuilles avec des bords jaunes.',
-            'impact': 'Réduction de la photosynthèse et du rendement.',
-            'treatment': 'Appliquez des fongicides appropriés.',
-            'prevention': 'Éliminez les feuilles infectées et améliorez la circulation de l\'air.'
-        },
-        'Grape healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        },
-        'Orange Haunglongbing Citrus greening': {
-            'symptoms': 'Feuilles jaunies, fruits déformés et amers.',
-            'impact': 'Décimation de la plantation et réduction drastique du rendement.',
-            'treatment': 'Il n\'existe actuellement aucun traitement efficace.',
-            'prevention': 'Utilisez des variétés résistantes et contrôlez les insectes vecteurs.'
-        },
-        'Peach Bacterial spot': {
-            'symptoms': 'Taches brunes sur les feuilles, les fruits et les branches.',
-            'impact': 'Réduction de la photosynthèse et des rendements.',
-            'treatment': 'Appliquez des fongicides à base de cuivre.',
-            'prevention': 'Éliminez les feuilles infectées et améliorez la circulation de l\'air.'
-        },
-        'Peach healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        },
-        'Pepper,_bell Bacterial spot': {
-            'symptoms': 'Taches brunes sur les feuilles et les fruits.',
-            'impact': 'Diminution de la qualité et du rendement des poivrons.',
-            'treatment': 'Utilisez des fongicides spécifiques et éliminez les plantes infectées.',
-            'prevention': 'Évitez l\'arrosage par le dessus et utilisez des variétés résistantes.'
-        },
-        'Pepper,_bell healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        },
-        'Potato Early blight': {
-            'symptoms': 'Taches brunes avec des anneaux concentriques sur les feuilles.',
-            'impact': 'Diminution de la photosynthèse et du rendement.',
-            'treatment': 'Appliquez des fongicides appropriés.',
-            'prevention': 'Éliminez les feuilles infectées et pratiquez la rotation des cultures.'
-        },
-        'Potato Late blight': {
-            'symptoms': 'Taches noires et vertes sur les feuilles et les tubercules.',
-            'impact': 'Décimation rapide des plantations si non contrôlée.',
-            'treatment': 'Appliquez immédiatement des fongicides spécifiques.',
-            'prevention': 'Éliminez les plantes infectées et assurez une bonne aération.'
-        },
-        'Potato healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        },
-        'Raspberry healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        },
-        'Soybean healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        },
-        'Squash Powdery mildew': {
-            'symptoms': 'Poudre blanche sur les feuilles et les tiges.',
-            'impact': 'Ralentit la croissance de la plante et réduit le rendement.',
-            'treatment': 'Utilisez des fongicides spécifiques ou des solutions à base de bicarbonate de soude.',
-            'prevention': 'Assurez une bonne circulation de l\'air et évitez l\'excès d\'humidité.'
-        },
-        'Strawberry Leaf scorch': {
-            'symptoms': 'Feuilles brûlées avec des bords brunis.',
-            'impact': 'Réduction de la photosynthèse et du rendement.',
-            'treatment': 'Utilisez des fongicides appropriés et améliorez la circulation de l\'air.',
-            'prevention': 'Éliminez les feuilles infectées et évitez l\'excès d\'humidité.'
-        },
-        'Strawberry healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        },
-        'Tomato Bacterial spot': {
-            'symptoms': 'Taches brunes sur les feuilles, les tiges et les fruits.',
-            'impact': 'Diminution de la photosynthèse et du rendement.',
-            'treatment': 'Appliquez des fongicides à base de cuivre.',
-            'prevention': 'Éliminez les feuilles infectées et améliorez la circulation de l\'air.'
-        },
-        'Tomato Early blight': {
-            'symptoms': 'Taches brunes avec des anneaux concentriques sur les feuilles.',
-            'impact': 'Réduction de la photosynthèse et du rendement.',
-            'treatment': 'Appliquez des fongicides appropriés.',
-            'prevention': 'Éliminez les feuilles infectées et pratiquez la rotation des cultures.'
-        },
-        'Tomato Late blight': {
-            'symptoms': 'Taches noires et vertes sur les feuilles et les fruits.',
-            'impact': 'Décimation rapide des plantations si non contrôlée.',
-            'treatment': 'Appliquez immédiatement des fongicides spécifiques.',
-            'prevention': 'Éliminez les plantes infectées et assurez une bonne aération.'
-        },
-        'Tomato Leaf Mold': {
-            'symptoms': 'Croûte grise sur les feuilles.',
-            'impact': 'Réduction de la photosynthèse et de la vigueur de la plante.',
-            'treatment': 'Utilisez des fongicides spécifiques et améliorez la circulation de l\'air.',
-            'prevention': 'Éliminez les feuilles infectées et évitez l\'excès d\'humidité.'
-        },
-        'Tomato Septoria leaf spot': {
-            'symptoms': 'Taches brunes sur les feuilles avec des bords jaunes.',
-            'impact': 'Réduction de la photosynthèse et du rendement.',
-            'treatment': 'Appliquez des fongicides appropriés.',
-            'prevention': 'Éliminez les feuilles infectées et assurez une bonne circulation de l\'air.'
-        },
-        'Tomato Spider mites Two-spotted spider mite': {
-            'symptoms': 'Petites taches jaunes et rougeâtres sur les feuilles, présence de toiles.',
-            'impact': 'Diminution de la photosynthèse et affaiblissement de la plante.',
-            'treatment': 'Utilisez des acaricides spécifiques ou des solutions naturelles comme le savon insecticide.',
-            'prevention': 'Maintenez une bonne hygiène de la plantation et surveillez régulièrement les plantes.'
-        },
-        'Tomato Target Spot': {
-            'symptoms': 'Taches circulaires brunes avec un anneau clair au centre.',
-            'impact': 'Réduction de la photosynthèse et du rendement.',
-            'treatment': 'Appliquez des fongicides spécifiques.',
-            'prevention': 'Éliminez les feuilles infectées et améliorez la circulation de l\'air.'
-        },
-        'Tomato Tomato Yellow Leaf Curl Virus': {
-            'symptoms': 'Feuilles jaunies et recroquevillées, croissance ralentie.',
-            'impact': 'Réduction sévère du rendement et de la qualité des fruits.',
-            'treatment': 'Il n\'existe actuellement aucun traitement efficace.',
-            'prevention': 'Contrôlez les vecteurs insectes et utilisez des variétés résistantes.'
-        },
-        'Tomato Tomato mosaic virus': {
-            'symptoms': 'Déformation des feuilles et des fruits, mosaïque de couleurs.',
-            'impact': 'Réduction de la photosynthèse et du rendement.',
-            'treatment': 'Il n\'existe actuellement aucun traitement efficace.',
-            'prevention': 'Utilisez des variétés résistantes et éliminez les plantes infectées.'
-        },
-        'Tomato healthy': {
-            'symptoms': 'Aucune maladie détectée.',
-            'impact': 'Plante en bonne santé.',
-            'treatment': 'Aucune action nécessaire.',
-            'prevention': 'Maintenez des conditions de culture optimales.'
-        }
-    }
-    return disease_details.get(disease_name, None)
+# Prédiction par ensemble : les modèles tournent en parallèle, probabilités moyennées
+def predict_ensemble_and_get_details(model_names, image_bytes):
+    try:
+        result = predict_ensemble(predictor, model_names, image_bytes)
+    except EnsembleError as e:
+        st.error(f"Erreur lors de la prédiction : {e}")
+        return None, 0, None
+    predicted_class_idx = np.argmax(result.proba)
+    predicted_proba = round(100 * result.proba[predicted_class_idx], 2)
+    return LABELS[predicted_class_idx], predicted_proba, result
 
-# Fonction pour prédire la maladie et obtenir les détails
-def predict_and_get_details(interpreter, image_array, class_names):
+# Prédiction en cascade : modèle léger d'abord, modèles lourds seulement si la confiance est insuffisante
+def predict_cascade_and_get_details(image_bytes):
     try:
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
-        
-        # Préparation des données
-        interpreter.set_tensor(input_details[0]['index'], image_array)
-        
-        # Faire la prédiction
-        interpreter.invoke()
-        
-        # Récupérer les résultats
-        output_data = interpreter.get_tensor(output_details[0]['index'])
-        proba = output_data[0]
-        predicted_class_idx = np.argmax(proba)
-        predicted_proba = round(100 * proba[predicted_class_idx], 2)
-        predicted_class_name = class_names[predicted_class_idx]
-        return predicted_class_name, predicted_proba
-    except Exception as e:
+        result = predict_cascade(predictor, image_bytes, stats=get_cascade_stats())
+    except PreprocessingError as e:
+        st.error(f"Erreur lors du prétraitement de l'image : {e}")
+        return None, 0, None
+    except (CascadeError, PoolTimeout) as e:
         st.error(f"Erreur lors de la prédiction : {e}")
-        return None, 0
-
-# Liste des noms de classes (38 classes)
-class_names = [
-    'Apple___Apple_scab',
-    'Apple___Black_rot',
-    'Apple___Cedar_apple_rust',
-    'Apple___healthy',
-    'Blueberry___healthy',
-    'Cherry_(including_sour)___Powdery_mildew',
-    'Cherry_(including_sour)___healthy',
-    'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot',
-    'Corn_(maize)___Common_rust_',
-    'Corn_(maize)___Northern_Leaf_Blight',
-    'Corn_(maize)___healthy',
-    'Grape___Black_rot',
-    'Grape___Esca_(Black_Measles)',
-    'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)',
-    'Grape___healthy',
-    'Orange___Haunglongbing_(Citrus_greening)',
-    'Peach___Bacterial_spot',
-    'Peach___healthy',
-    'Pepper,_bell___Bacterial_spot',
-    'Pepper,_bell___healthy',
-    'Potato___Early_blight',
-    'Potato___Late_blight',
-    'Potato___healthy',
-    'Raspberry___healthy',
-    'Soybean___healthy',
-    'Squash___Powdery_mildew',
-    'Strawberry___Leaf_scorch',
-    'Strawberry___healthy',
-    'Tomato___Bacterial_spot',
-    'Tomato___Early_blight',
-    'Tomato___Late_blight',
-    'Tomato___Leaf_Mold',
-    'Tomato___Septoria_leaf_spot',
-    'Tomato___Spider_mites Two-spotted_spider_mite',
-    'Tomato___Target_Spot',
-    'Tomato___Tomato_Yellow_Leaf_Curl_Virus',
-    'Tomato___Tomato_mosaic_virus',
-    'Tomato___healthy'
-]
+        return None, 0, None
+    predicted_class_idx = np.argmax(result.proba)
+    predicted_proba = round(100 * result.proba[predicted_class_idx], 2)
+    return LABELS[predicted_class_idx], predicted_proba, result
+
+# Affichage du résultat de l'analyse et du détail des modes Ensemble / Cascade
+def render_result(predicted_class, confidence, ensemble_result=None, cascade_result=None, model_version=None):
+    # Déterminer le style en fonction de la confiance
+    if confidence >= 80:
+        result_style = "result-success"
+    elif confidence >= 50:
+        result_style = "result-warning"
+    else:
+        result_style = "result-error"
+
+    # Message en cas d'incertitude
+    if confidence < 50:
+        st.warning("⚠️ La confiance dans la prédiction est faible. Essayez une photo plus claire ou consultez un expert.")
+
+    # Affichage des résultats
+    st.markdown(
+        f"""
+        <div class="result-block {result_style}">
+            <h2 class="subtitle">Résultat de l'Analyse</h2>
+            <p><strong>Résultat :</strong> {predicted_class.diagnosis}</p>
+            <p><strong>Confiance :</strong> {confidence:.2f}%</p>
+            <hr>
+            <div>
+                {predicted_class.recommendations_html}
+            </div>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
+    # Détail par modèle du mode Ensemble (durée totale ≈ modèle le plus lent)
+    if ensemble_result is not None:
+        st.markdown(f"**Détail de l'ensemble** (durée totale : {ensemble_result.latency_ms:.0f} ms)")
+        st.table([
+            {
+                "Modèle": member.name,
+                "Poids": member.weight,
+                "Prédiction": LABELS[np.argmax(member.proba)].name if member.error is None else "—",
+                "Confiance (%)": round(100 * float(np.max(member.proba)), 2) if member.error is None else None,
+                "Latence (ms)": round(member.latency_ms, 1),
+                "Version": member.version or "",
+                "Erreur": member.error or "",
+            }
+            for member in ensemble_result.members
+        ])
+
+    # Étape de la cascade ayant fourni la réponse
+    if cascade_result is not None:
+        steps = " → ".join(f"{stage.name} ({100 * stage.confidence:.0f} %)" for stage in cascade_result.stages)
+        st.caption(f"Réponse fournie par {cascade_result.answered_by} (version {cascade_result.stages[-1].version}) "
+                   f"— étapes : {steps}")
+
+    # Version du modèle qui a répondu (change après un rechargement à chaud)
+    if model_version is not None:
+        st.caption(f"Version du modèle : {model_version}")
 
 # Appliquer les styles personnalisés
+static_assets = get_static_assets()
 set_custom_style()
 
-# Chemins locaux pour les modèles TFLite
-model_local_path_resnet = "models/phil_resnet_best_20241202_v7_epoch25.tflite"
-model_local_path_mobilenet = "models/Anas_Essai_1_MOB_L2.tflite"
-model_local_path_cnn = "models/phil_cnn_2_best_20241122_v1_epoch61.tflite"
+# Options de la sidebar pour combiner plusieurs modèles
+ENSEMBLE_MODE = "Ensemble"
+CASCADE_MODE = "Cascade"
 
-# Créer le dossier 'models' s'il n'existe pas
-os.makedirs(os.path.dirname(model_local_path_resnet), exist_ok=True)
-
-# Charger les modèles TFLite avec mise en cache
-interpreter_resnet = load_tflite_model(model_local_path_resnet)
-interpreter_mobilenet = load_tflite_model(model_local_path_mobilenet)
-interpreter_cnn = load_tflite_model(model_local_path_cnn)
+# Modèles déclarés dans le manifeste ; le modèle par défaut est préchauffé en arrière-plan
+predictor = get_predictor()
+model_manager = predictor.manager
+warmup = get_warmup()
+model_watcher = get_model_watcher()
+load_policy = get_load_policy()
+get_metrics_exporters()
 
 # Sidebar
 st.sidebar.title("Reco-Plantes")
-
-# Dictionnaire des interpréteurs des modèles
-model_interpreters = {
-    "ResNet50": interpreter_resnet,
-    "MobileNetV2": interpreter_mobilenet,
-    "CNN": interpreter_cnn,
-}
+if not warmup.done:
+    st.sidebar.caption("⏳ Préchauffage des modèles en cours : la première analyse peut être plus lente.")
+elif not warmup.ready:
+    st.sidebar.caption("⚠️ Aucun modèle n'a pu être préchauffé.")
 
 # Description du modèle dans la sidebar
-model_descriptions = {
-    "ResNet50": "Modèle ResNet50 optimisé pour une précision élevée.",
-    "MobileNetV2": "Modèle MobileNetV2, léger et rapide pour les applications mobiles.",
-    "CNN": "Modèle CNN personnalisé pour une détection rapide des maladies.",
-}
-
-# Sélection du modèle
-selected_model = st.sidebar.selectbox("Choisissez un modèle :", list(model_interpreters.keys()))
-
-# Vérifier que le modèle sélectionné a été chargé correctement
-interpreter = model_interpreters.get(selected_model)
+model_descriptions = {name: spec.description for name, spec in model_manager.specs.items()}
+model_descriptions[ENSEMBLE_MODE] = "Combinaison pondérée des modèles choisis, exécutés en parallèle."
+model_descriptions[CASCADE_MODE] = (
+    f"Modèle léger d'abord ({' → '.join(CASCADE_STAGES)}), modèle suivant seulement "
+    f"si la confiance est inférieure à {CASCADE_THRESHOLD:.0%}."
+)
+
+# Sélection du modèle : le modèle préchauffé (premier disponible) est proposé par défaut
+model_options = list(model_manager.specs) + [ENSEMBLE_MODE, CASCADE_MODE]
+default_model = first_available(model_manager)
+selected_model = st.sidebar.selectbox(
+    "Choisissez un modèle :",
+    model_options,
+    index=model_options.index(default_model) if default_model is not None else 0,
+    format_func=lambda name: name if name in (ENSEMBLE_MODE, CASCADE_MODE) or model_manager.is_available(name) else f"{name} (indisponible)",
+)
+
+# Charger le(s) modèle(s) sélectionné(s) et vérifier qu'ils ont été chargés correctement
+tiled_mode = False
+if selected_model == ENSEMBLE_MODE:
+    available_models = [name for name in model_manager.specs if model_manager.is_available(name)]
+    ensemble_members = st.sidebar.multiselect(
+        "Modèles de l'ensemble :", available_models, default=available_models
+    )
+    model_ready = bool(ensemble_members)
+elif selected_model == CASCADE_MODE:
+    model_ready = any(model_manager.is_available(name) for name in CASCADE_STAGES)
+else:
+    model_ready = load_tflite_model(selected_model) is not None
+    # Photos de plante entière ou de rang : découpage en tuiles plutôt que réduction globale
+    tiled_mode = st.sidebar.checkbox(
+        "Analyse par tuiles (grandes photos)",
+        help="Découpe la photo en tuiles qui se chevauchent et affiche la carte des zones malades.",
+    )
 
-if interpreter is None:
-    st.error(f"Le modèle {selected_model} n'a pas pu être chargé correctement.")
+if not model_ready:
+    if selected_model == ENSEMBLE_MODE:
+        st.error("Sélectionnez au moins un modèle disponible pour l'ensemble.")
+    elif selected_model == CASCADE_MODE:
+        st.error("Aucun modèle de la cascade n'est disponible.")
+    else:
+        st.error(f"Le modèle {selected_model} n'a pas pu être chargé correctement.")
 else:
     st.sidebar.markdown(
         f"""
@@ -590,6 +475,14 @@ else:
         unsafe_allow_html=True
     )
 
+    # Part des analyses traitées par chaque étape de la cascade
+    if selected_model == CASCADE_MODE:
+        cascade_stats = get_cascade_stats().stats()
+        if cascade_stats["total"]:
+            with st.sidebar.expander("Statistiques de la cascade"):
+                for name, share in cascade_stats["answered_share"].items():
+                    st.write(f"{name} : {share:.0%} des analyses")
+
     # Upload de l'image
     uploaded_file = st.sidebar.file_uploader("Téléchargez une image", type=["jpg", "png"])
 
@@ -607,7 +500,7 @@ else:
     if not os.path.exists(logo_path):
         st.error(f"⚠️ L'image '{logo_path}' est introuvable. Vérifiez le chemin ou le dossier.")
     else:
-        logo_base64 = get_image_base64(logo_path)
+        logo_base64 = get_asset_src("logo", logo_path)
         if logo_base64:
             st.markdown(
                 f"""
@@ -639,71 +532,51 @@ else:
     )
 
     # Analyse et résultats
-    if uploaded_file and interpreter:
+    if uploaded_file and model_ready:
         st.image(uploaded_file, caption="Image téléchargée", use_column_width=True)
-        with st.spinner("Analyse en cours... Veuillez patienter"):
-            # Obtenir la taille d'entrée du modèle
-            input_details = interpreter.get_input_details()
-            input_shape = input_details[0]['shape'][1:3]
-            image_array = preprocess_image(uploaded_file, target_size=input_shape)
-            if image_array is not None:
-                predicted_class, confidence = predict_and_get_details(interpreter, image_array, class_names)
-            else:
-                predicted_class, confidence = None, 0
-
-        if predicted_class:
-            # Nettoyer la prédiction
-            predicted_class_clean = clean_class_name(predicted_class)
-
-            # Récupérer les détails de la maladie
-            disease_details = get_disease_details(predicted_class_clean)
-
-            # Déterminer le style en fonction de la confiance
-            if confidence >= 80:
-                result_style = "result-success"
-            elif confidence >= 50:
-                result_style = "result-warning"
-            else:
-                result_style = "result-error"
-
-            recommendations = ""
-
-            if 'healthy' in predicted_class_clean.lower():
-                diagnosis = "Feuille en bonne santé."
-                recommendations = "<strong>Aucune action nécessaire.</strong>"
-            else:
-                diagnosis = f"Maladie détectée - {predicted_class_clean}."
-                if disease_details:
-                    recommendations = f"""
-                    <strong>Symptômes :</strong> {disease_details['symptoms']}<br>
-                    <strong>Impact :</strong> {disease_details['impact']}<br>
-                    <strong>Traitement :</strong> {disease_details['treatment']}<br>
-                    <strong>Prévention :</strong> {disease_details['prevention']}
-                    """
+        ensemble_result = None
+        cascade_result = None
+        tiled_result = None
+        model_version = None
+        prediction = None
+        # Durée de chaque étape de l'analyse (cache, décodage, inférence, affichage)
+        with trace_request("request", model=selected_model) as request_trace:
+            with st.spinner("Analyse en cours... Veuillez patienter"), span("predict", model=selected_model):
+                # Les octets bruts servent à la fois au cache et au décodage
+                image_bytes = uploaded_file.getvalue()
+                if selected_model == ENSEMBLE_MODE:
+                    predicted_class, confidence, ensemble_result = predict_ensemble_and_get_details(
+                        ensemble_members, image_bytes
+                    )
+                elif selected_model == CASCADE_MODE:
+                    predicted_class, confidence, cascade_result = predict_cascade_and_get_details(image_bytes)
+                elif tiled_mode:
+                    predicted_class, confidence, tiled_result = predict_tiled_and_get_details(
+                        selected_model, image_bytes
+                    )
+                    model_version = tiled_result.version if tiled_result is not None else None
                 else:
-                    recommendations = "Aucune recommandation disponible. Veuillez consulter un expert agricole."
-
-            # Message en cas d'incertitude
-            if confidence < 50:
-                st.warning("⚠️ La confiance dans la prédiction est faible. Essayez une photo plus claire ou consultez un expert.")
-
-            # Affichage des résultats
-            st.markdown(
-                f"""
-                <div class="result-block {result_style}">
-                    <h2 class="subtitle">Résultat de l'Analyse</h2>
-                    <p><strong>Résultat :</strong> {diagnosis}</p>
-                    <p><strong>Confiance :</strong> {confidence:.2f}%</p>
-                    <hr>
-                    <div>
-                        {recommendations}
-                    </div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-        else:
-            st.error("⚠️ Impossible de déterminer le résultat de l'analyse.")
+                    predicted_class, confidence, prediction = predict_and_get_details(selected_model, image_bytes)
+                    model_version = prediction.version if prediction is not None else None
+
+            if predicted_class:
+                if prediction is not None and prediction.downgraded:
+                    st.warning(
+                        f"⚡ Serveur très sollicité : l'analyse a été réalisée avec le modèle {prediction.model} "
+                        f"au lieu de {prediction.requested}, pour vous répondre plus vite."
+                    )
+                with span("render", model=selected_model):
+                    render_result(predicted_class, confidence, ensemble_result, cascade_result, model_version)
+                    if tiled_result is not None:
+                        grid = tiled_result.grid
+                        st.image(
+                            heatmap_overlay(image_bytes, tiled_result.heatmap),
+                            caption=f"Zones malades estimées ({grid.rows}x{grid.cols} tuiles)",
+                            use_column_width=True,
+                        )
+            else:
+                st.error("⚠️ Impossible de déterminer le résultat de l'analyse.")
+        st.session_state["last_trace"] = request_trace
     else:
         if not uploaded_file:
             st.markdown(
@@ -721,7 +594,7 @@ else:
     if not os.path.exists(image_path):
         st.error(f"⚠️ L'image '{image_path}' est introuvable. Vérifiez le chemin ou le dossier.")
     else:
-        image_base64 = get_image_base64(image_path)
+        image_base64 = get_asset_src("imagecss", image_path)
         if image_base64:
             st.markdown(
                 f"""
@@ -756,3 +629,23 @@ else:
         """,
         unsafe_allow_html=True
     )
+
+    # Panneau de débogage : détail de la dernière analyse et état des modèles chargés
+    if DEBUG_PANEL:
+        with st.sidebar.expander("Débogage"):
+            last_trace = st.session_state.get("last_trace")
+            if last_trace is not None:
+                st.write(f"Dernière analyse : {last_trace.total_ms:.1f} ms")
+                st.table([
+                    {"Étape": stage, "Modèle": labels.get("model", ""), "Durée (ms)": round(1000 * seconds, 2)}
+                    for stage, seconds, labels in last_trace.spans
+                ])
+            st.json({
+                "modèles": model_manager.stats(),
+                "pools": {name: engine.pool.stats() for name, engine in model_manager.engines().items()},
+                "micro-batching": {name: engine.stats() for name, engine in model_manager.engines().items()},
+                "cache": predictor.cache.stats() if predictor.cache is not None else None,
+                "préchauffage": warmup.stats(),
+                "rechargement": model_watcher.stats() if model_watcher is not None else None,
+                "charge": load_policy.stats() if load_policy is not None else None,
+            })
@@ -1,141 +1,247 @@
 # -*- coding: utf-8 -*-
-"""Script_Best_models_Github.ipynb
+"""
+Prédiction par lots, sans interface, avec les modèles TFLite du manifeste.
 
-Automatically generated by Colab.
+Les images (dossiers, motifs glob, fichiers ou listes `@fichier.txt`) sont
+décodées dans un pool de threads, inférées par lots dans un pool de
+processus, et les résultats écrits au fil de l'eau en CSV ou JSONL.
 
-Original file is located at
-    https://colab.research.google.com/drive/1pC4AYVAePerySAQtxT0oUKwimIbTkVzu
+Exemple (depuis la racine du dépôt) :
+    python -m models.main test_images --model CNN --output resultats.csv
 """
 
-import tensorflow as tf
-import numpy as np
-from tensorflow.keras.preprocessing.image import load_img, img_to_array
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
 import os
-import matplotlib.pyplot as plt
-
-# Debug temporaire pour afficher les fichiers dans le dossier courant
-print("Répertoire courant :", os.getcwd())
-print("Fichiers dans le dossier courant :", os.listdir('.'))
-
-# Liste des modèles disponibles
-models = {
-    "Model 1": "Anas_Essai_1_MOB_L2.keras",
-    "Model 2": "Anas_Essai_1_MOB_Repeat.keras",
-    "Model 3": "leila_best_model_cnn_TEM3.keras",
-    "Model 4": "model_cnn_4_best.keras"
-}
-
-# Noms des classes complets (à adapter selon vos besoins)
-class_names = [
-    'Apple___Apple_scab',
-    'Apple___Black_rot',
-    'Apple___Cedar_apple_rust',
-    'Apple___healthy',
-    'Blueberry___healthy',
-    'Cherry_(including_sour)___Powdery_mildew',
-    'Cherry_(including_sour)___healthy',
-    'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot',
-    'Corn_(maize)___Common_rust_',
-    'Corn_(maize)___Northern_Leaf_Blight',
-    'Corn_(maize)___healthy',
-    'Grape___Black_rot',
-    'Grape___Esca_(Black_Measles)',
-    'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)',
-    'Grape___healthy',
-    'Orange___Haunglongbing_(Citrus_greening)',
-    'Peach___Bacterial_spot',
-    'Peach___healthy',
-    'Pepper,_bell___Bacterial_spot',
-    'Pepper,_bell___healthy',
-    'Potato___Early_blight',
-    'Potato___Late_blight',
-    'Potato___healthy',
-    'Raspberry___healthy',
-    'Soybean___healthy',
-    'Squash___Powdery_mildew',
-    'Strawberry___Leaf_scorch',
-    'Strawberry___healthy',
-    'Tomato___Bacterial_spot',
-    'Tomato___Early_blight',
-    'Tomato___Late_blight',
-    'Tomato___Leaf_Mold',
-    'Tomato___Septoria_leaf_spot',
-    'Tomato___Spider_mites Two-spotted_spider_mite',
-    'Tomato___Target_Spot',
-    'Tomato___Tomato_Yellow_Leaf_Curl_Virus',
-    'Tomato___Tomato_mosaic_virus',
-    'Tomato___healthy'
-]
-
-def load_model(model_path):
-    print(f"Chargement du modèle depuis : {model_path}")
-    model = tf.keras.models.load_model(model_path)
-    print("Modèle chargé avec succès.")
-    return model
-
-def preprocess_image(image_path, target_size):
-    print(f"Prétraitement de l'image : {image_path}")
-    img = load_img(image_path, target_size=target_size)  # Redimensionne l'image
-    img_array = img_to_array(img)  # Convertit l'image en tableau NumPy
-    img_array = np.expand_dims(img_array, axis=0)  # Ajoute une dimension batch
-    img_array = tf.keras.applications.mobilenet_v2.preprocess_input(img_array)  # Normalisation
-    return img_array
-
-def predict_image(model, image_array):
-    print("Prédiction...")
-    predictions = model.predict(image_array)
-    print(f"Prédictions brutes : {predictions}")  # Debug
-    predicted_index = np.argmax(predictions)
-    print(f"Index prédit : {predicted_index}")  # Debug
-    if predicted_index >= len(class_names):
-        print("Erreur : L'index prédit dépasse le nombre de classes définies.")
-        return "Classe inconnue", 0.0
-    predicted_class = class_names[predicted_index]
-    confidence = np.max(predictions) * 100
-    return predicted_class, confidence
-
-def display_image(image_path, predicted_class, confidence):
-    img = load_img(image_path)
-    plt.imshow(img)
-    plt.axis("off")
-    plt.title(f"Prédiction : {predicted_class} ({confidence:.2f}%)")
-    plt.show()
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from recoplantes.interpreter import create_interpreter
+from recoplantes.labels import CLASS_NAMES, LABELS
+from recoplantes.loader import check_input_size
+from recoplantes.manifest import load_manifest
+from recoplantes.preprocessing import load_image
+from recoplantes.signature import ModelSignature
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# État propre à chaque processus d'inférence
+_worker = {}
+
+
+def collect_images(inputs, recursive=False):
+    paths = []
+    for item in inputs:
+        if item.startswith("@"):
+            # Liste de fichiers, un chemin par ligne
+            with open(item[1:], encoding="utf-8") as f:
+                paths.extend(line.strip() for line in f if line.strip())
+        elif os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*") if recursive else os.path.join(item, "*")
+            paths.extend(
+                p for p in sorted(glob.glob(pattern, recursive=recursive))
+                if p.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        elif glob.has_magic(item):
+            paths.extend(sorted(glob.glob(item, recursive=True)))
+        else:
+            paths.append(item)
+    # Doublons supprimés, ordre conservé
+    return list(dict.fromkeys(paths))
+
+
+def _init_worker(model_path, num_threads, xnnpack, preprocessing):
+    interpreter = create_interpreter(model_path, num_threads=num_threads, xnnpack=xnnpack)
+    _worker["interpreter"] = interpreter
+    _worker["signature"] = ModelSignature(interpreter, preprocessing.normalizer())
+
+
+def _infer_batch(images):
+    return np.stack(_worker["signature"].infer(_worker["interpreter"], list(images)))
+
+
+def _bounded_map(executor, fn, items, ahead):
+    # Équivalent de executor.map() qui ne décode qu'un nombre borné d'images en avance
+    window = deque()
+    for item in items:
+        window.append(executor.submit(fn, item))
+        if len(window) >= ahead:
+            yield window.popleft().result()
+    while window:
+        yield window.popleft().result()
+
+
+def _decode(path, target_size):
+    try:
+        return path, load_image(path, target_size), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+class ResultWriter:
+    def __init__(self, path, fmt):
+        self._file = open(path, "w", encoding="utf-8", newline="") if path != "-" else sys.stdout
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(["path", "predicted_class", "confidence", "error"])
+
+    def write(self, path, predicted_class=None, confidence=None, error=None):
+        if self._csv is not None:
+            self._csv.writerow([path, predicted_class or "", "" if confidence is None else f"{confidence:.2f}", error or ""])
+        else:
+            self._file.write(json.dumps({
+                "path": path, "predicted_class": predicted_class, "confidence": confidence, "error": error,
+            }, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class Progress:
+    def __init__(self, total, stream=sys.stderr, width=30):
+        self.total = total
+        self.done = 0
+        self.start = time.perf_counter()
+        self._stream = stream
+        self._width = width
+
+    def update(self, count):
+        self.done += count
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        filled = int(self._width * self.done / self.total) if self.total else self._width
+        bar = "#" * filled + "." * (self._width - filled)
+        self._stream.write(f"\r[{bar}] {self.done}/{self.total} images, {rate:.1f} img/s")
+        self._stream.flush()
+
+    def finish(self):
+        self._stream.write("\n")
+        return time.perf_counter() - self.start
+
+
+def run(paths, spec, writer, batch_size=32, decode_threads=None, workers=None, num_threads=1):
+    workers = workers or os.cpu_count() or 1
+    decode_threads = decode_threads or min(32, (os.cpu_count() or 1) + 4)
+    # spawn : les processus d'inférence sont créés à la demande, alors que les threads
+    # de décodage tournent déjà ; un fork copierait un processus multi-thread
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(spec.path, num_threads, spec.xnnpack, spec.preprocessing),
+    ) as processes:
+        # Taille d'entrée lue une fois dans le processus principal
+        signature = ModelSignature(create_interpreter(spec.path, num_threads=1, xnnpack=spec.xnnpack))
+        LABELS.check_output(signature.num_classes, spec.name)
+        check_input_size(signature, spec)
+        target_size = signature.input_shape[:2]
+        max_in_flight = 2 * workers
+        progress = Progress(len(paths))
+        errors = 0
+
+        def drain(pending, block):
+            nonlocal errors
+            done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch_paths = pending.pop(future)
+                try:
+                    probas = future.result()
+                except Exception as e:
+                    for path in batch_paths:
+                        writer.write(path, error=f"Erreur d'inférence : {e}")
+                    errors += len(batch_paths)
+                else:
+                    for path, proba in zip(batch_paths, probas):
+                        idx = int(np.argmax(proba))
+                        writer.write(path, CLASS_NAMES[idx], round(100 * float(proba[idx]), 2))
+                progress.update(len(batch_paths))
+
+        pending = {}
+        batch_paths, batch_images = [], []
+        with ThreadPoolExecutor(max_workers=decode_threads) as threads:
+            # Ordre conservé, décodage en avance d'au plus deux lots
+            decoded = _bounded_map(threads, lambda p: _decode(p, target_size), paths, 2 * batch_size)
+            for path, image, error in decoded:
+                if error is not None:
+                    writer.write(path, error=f"Erreur de décodage : {error}")
+                    errors += 1
+                    progress.update(1)
+                    continue
+                batch_paths.append(path)
+                batch_images.append(image)
+                if len(batch_images) == batch_size:
+                    # Nombre de lots en vol borné pour limiter la mémoire
+                    while len(pending) >= max_in_flight:
+                        drain(pending, block=True)
+                    pending[processes.submit(_infer_batch, np.stack(batch_images))] = batch_paths
+                    batch_paths, batch_images = [], []
+                    drain(pending, block=False)
+            if batch_images:
+                pending[processes.submit(_infer_batch, np.stack(batch_images))] = batch_paths
+        while pending:
+            drain(pending, block=True)
+
+    elapsed = progress.finish()
+    return progress.done, errors, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prédiction par lots des maladies des plantes (TFLite).")
+    parser.add_argument("inputs", nargs="+", help="Dossiers, motifs glob, fichiers ou listes @fichier.txt")
+    parser.add_argument("--model", default="CNN", help="Nom du modèle dans models/manifest.json (défaut : CNN)")
+    parser.add_argument("--output", default="-", help="Fichier de sortie .csv ou .jsonl (défaut : sortie standard)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Format de sortie (déduit de l'extension par défaut)")
+    parser.add_argument("--recursive", action="store_true", help="Parcourir les sous-dossiers")
+    parser.add_argument("--batch-size", type=int, default=32, help="Images par invocation (défaut : 32)")
+    parser.add_argument("--decode-threads", type=int, default=None, help="Threads de décodage")
+    parser.add_argument("--workers", type=int, default=None, help="Processus d'inférence (défaut : nombre de cœurs)")
+    parser.add_argument("--threads", type=int, default=1, help="Threads TFLite par processus (défaut : 1)")
+    args = parser.parse_args(argv)
+
+    specs = load_manifest()
+    spec = specs.get(args.model)
+    if spec is None:
+        parser.error(f"Modèle inconnu : {args.model} (disponibles : {', '.join(specs)})")
+    if not spec.available:
+        parser.error(f"Le fichier du modèle {args.model} est introuvable : {spec.path}")
+
+    paths = collect_images(args.inputs, recursive=args.recursive)
+    if not paths:
+        parser.error("Aucune image trouvée.")
+
+    fmt = args.format or ("jsonl" if args.output.endswith(".jsonl") else "csv")
+    writer = ResultWriter(args.output, fmt)
+    try:
+        count, errors, elapsed = run(
+            paths, spec, writer,
+            batch_size=args.batch_size,
+            decode_threads=args.decode_threads,
+            workers=args.workers,
+            num_threads=args.threads,
+        )
+    except ValueError as e:
+        # Sorties ou taille d'entrée du modèle incohérentes avec le registre / le manifeste
+        parser.error(str(e))
+    finally:
+        writer.close()
+
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(
+        f"{count} images traitées ({errors} erreurs) en {elapsed:.1f} s, soit {rate:.1f} images/s.",
+        file=sys.stderr,
+    )
+    return 1 if errors else 0
+
 
 if __name__ == "__main__":
-    # Étape 1 : Liste des modèles
-    print("Modèles disponibles :")
-    for i, model_name in enumerate(models.keys(), start=1):
-        print(f"{i}. {model_name}")
-
-    # Étape 2 : Sélection du modèle
-    choice = int(input("Entrez le numéro du modèle à utiliser : "))
-    selected_model_path = models[list(models.keys())[choice - 1]]
-
-    # Étape 3 : Charger le modèle
-    model = load_model(selected_model_path)
-
-    # Récupérer dynamiquement le nombre de classes
-    num_classes = model.output_shape[-1]
-    print(f"Nombre de classes dans le modèle : {num_classes}")
-    if len(class_names) != num_classes:
-        print("Attention : Le nombre de classes dans class_names ne correspond pas au modèle.")
-        class_names = [f"Classe {i}" for i in range(num_classes)]
-
-    # Récupérer la taille d'entrée du modèle
-    input_shape = model.input_shape[1:3]  # Extrait (hauteur, largeur) attendu
-
-    # Étape 4 : Prédire une image
-    base_image_path = "C:/Users/anasm/Downloads/Reco-Plantes/test_images"  # Chemin absolu du dossier d'images
-    image_name = input("Entrez le nom de l'image à prédire (ex : apple_scab_02.jpg) : ").strip()
-    image_path = os.path.join(base_image_path, image_name)
-
-    # Vérifier si le fichier existe
-    print(f"Chemin complet généré pour l'image : {image_path}")  # Debug
-    if not os.path.exists(image_path):
-        print(f"Erreur : le fichier {image_path} n'existe pas.")
-    else:
-        image_array = preprocess_image(image_path, target_size=input_shape)
-        predicted_class, confidence = predict_image(model, image_array)
-
-        # Étape 5 : Afficher le résultat
-        display_image(image_path, predicted_class, confidence)
\ No newline at end of file
+    sys.exit(main())
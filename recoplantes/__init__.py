@@ -0,0 +1,4 @@
+"""
+Briques de service pour la reconnaissance des maladies des plantes
+(chargement des modèles TFLite, inférence, prétraitement).
+"""
@@ -0,0 +1,149 @@
+"""
+Choix du modèle selon la charge (`RECO_ADAPTIVE=1`).
+
+Quand la machine est saturée, les requêtes sur un modèle lourd s'accumulent
+alors qu'un modèle plus léger répondrait bien plus vite. Avant chaque
+requête, la latence attendue du modèle demandé est estimée à partir de son
+moteur : durée moyenne d'une invocation sur la fenêtre récente
+(`RECO_ADAPTIVE_WINDOW_S` secondes, attente exclue, première invocation de
+chaque interpréteur exclue), multipliée par le nombre de batchs à passer
+avant la requête (file courante / taille de batch, plus le sien). La file
+est lue à chaque requête : l'estimation suit une montée de charge sans
+attendre que les latences mesurées la reflètent, et retombe dès que la file
+se vide, même si le modèle n'a plus servi entre-temps.
+
+Si l'estimation dépasse l'échéance de la requête (`RECO_ADAPTIVE_DEADLINE_MS`),
+on descend dans l'ordre des modèles (`RECO_ADAPTIVE_ORDER`, du plus léger au
+plus lourd) jusqu'au premier qui tient l'échéance, sinon le plus léger. Un
+modèle non chargé ou sans invocation dans la fenêtre est supposé tenir
+l'échéance : le modèle déclassé est donc retenté, et sa durée d'invocation
+remesurée, dès que ses anciennes mesures sortent de la fenêtre. Une image
+déjà en cache pour le modèle demandé n'est jamais déclassée.
+
+Le résultat indique le modèle qui a répondu et celui qui avait été demandé ;
+chaque déclassement est compté dans `reco_downgrades_total`.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+from recoplantes.config import get_setting
+from recoplantes.metrics import METRICS
+
+ADAPTIVE = bool(get_setting("adaptive", 0, int))
+DEADLINE_MS = get_setting("adaptive_deadline_ms", 1500.0, float)
+# Du moins coûteux au plus coûteux (par défaut, l'ordre de la cascade)
+ADAPTIVE_ORDER = [
+    name.strip()
+    for name in get_setting("adaptive_order", get_setting("cascade_stages", "CNN,MobileNetV2,ResNet50")).split(",")
+    if name.strip()
+]
+WINDOW_SECONDS = get_setting("adaptive_window_s", 30.0, float)
+WINDOW_SIZE = 64
+
+
+class LoadPolicy:
+    def __init__(self, manager, order=None, deadline_ms=DEADLINE_MS, window_seconds=WINDOW_SECONDS):
+        self.manager = manager
+        self.order = list(order or ADAPTIVE_ORDER)
+        self.deadline = deadline_ms / 1000
+        self.window_seconds = window_seconds
+        # Par modèle : (version du moteur, relevés (instant, invocations, durée cumulée))
+        self._invokes = {}
+        self._downgrades = {}
+        self._lock = threading.Lock()
+
+    def invoke_latency(self, name, stats):
+        # Durée moyenne d'une invocation (s) sur la fenêtre, d'après les compteurs cumulés du
+        # moteur relevés à chaque estimation ; None sans invocation mesurée dans la fenêtre
+        now = time.monotonic()
+        sample = (now, stats["timed_invokes"], stats["invoke_seconds"])
+        with self._lock:
+            version, samples = self._invokes.get(name, (None, None))
+            if version != stats["version"] or (samples and sample[1] < samples[-1][1]):
+                # Moteur remplacé (rechargement, déchargement) : compteurs repartis de zéro
+                samples = deque(maxlen=WINDOW_SIZE)
+                self._invokes[name] = (stats["version"], samples)
+            if not samples or samples[-1][1] != sample[1]:
+                samples.append(sample)
+            cutoff = now - self.window_seconds
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            if len(samples) < 2:
+                return None
+            (_, first_count, first_seconds), (_, last_count, last_seconds) = samples[0], samples[-1]
+        return (last_seconds - first_seconds) / (last_count - first_count)
+
+    def estimate(self, name):
+        # Latence attendue (s) d'une nouvelle requête : batchs déjà en file puis le sien ;
+        # None si le modèle n'est pas chargé ou n'a pas de mesure récente
+        engine = self.manager.engines().get(name)
+        if engine is None:
+            return None
+        stats = dict(engine.stats(), version=engine.version)
+        per_batch = self.invoke_latency(name, stats)
+        if per_batch is None:
+            return None
+        return per_batch * (1 + math.ceil(stats["queued"] / stats["max_batch"]))
+
+    def candidates(self, requested):
+        # Modèle demandé, puis les modèles plus légers du plus lourd au plus léger
+        if requested not in self.order:
+            return [requested]
+        cheaper = self.order[:self.order.index(requested)]
+        return [requested] + [name for name in reversed(cheaper) if self.manager.is_available(name)]
+
+    def choose(self, requested, deadline=None):
+        deadline = self.deadline if deadline is None else deadline
+        candidates = self.candidates(requested)
+        for name in candidates:
+            estimate = self.estimate(name)
+            if estimate is None or estimate <= deadline:
+                return name
+        return candidates[-1]
+
+    def predict(self, predictor, model_name, image_bytes, deadline=None, timeout=None):
+        chosen = self.choose(model_name, deadline)
+        if chosen != model_name:
+            # Réponse du modèle demandé déjà connue : rien à gagner à déclasser
+            cached = predictor.cached(model_name, image_bytes)
+            if cached is not None:
+                return cached
+        prediction = predictor.predict(chosen, image_bytes, timeout=timeout)
+        if chosen != model_name:
+            prediction.requested = model_name
+            with self._lock:
+                key = (model_name, chosen)
+                self._downgrades[key] = self._downgrades.get(key, 0) + 1
+        return prediction
+
+    def stats(self):
+        with self._lock:
+            downgrades = dict(self._downgrades)
+        estimates = {name: self.estimate(name) for name in self.order}
+        return {
+            "deadline_ms": 1000 * self.deadline,
+            "estimate_ms": {name: round(1000 * value, 1) for name, value in estimates.items() if value is not None},
+            "downgrades": {f"{requested} → {served}": count for (requested, served), count in downgrades.items()},
+        }
+
+    def collect(self):
+        with self._lock:
+            downgrades = dict(self._downgrades)
+        estimates = [(name, self.estimate(name)) for name in self.order]
+        return [
+            ("reco_downgrades_total", "counter", "Requêtes servies par un modèle plus léger que celui demandé",
+             [({"requested": requested, "served": served}, count) for (requested, served), count in downgrades.items()]),
+            ("reco_adaptive_estimate_seconds", "gauge", "Latence attendue d'une nouvelle requête par modèle",
+             [({"model": name}, estimate) for name, estimate in estimates if estimate is not None]),
+        ]
+
+
+def build_policy(manager, enabled=ADAPTIVE):
+    if not enabled:
+        return None
+    policy = LoadPolicy(manager)
+    METRICS.register_collector(policy.collect)
+    return policy
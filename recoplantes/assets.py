@@ -0,0 +1,161 @@
+"""
+Préparation des ressources statiques de l'interface.
+
+Les images de `assets/` sont redimensionnées à leur taille d'affichage (x2
+pour les écrans haute densité) et compressées en WebP dans `static/`, servi
+par Streamlit (`server.enableStaticServing`) à l'adresse `app/static/`. Les
+URL portent l'empreinte du fichier (`?v=...`) : le navigateur les conserve en
+cache et ne les recharge qu'après une nouvelle génération.
+
+Les polices (fichiers `.woff2` déposés dans `assets/fonts/`) sont copiées
+dans `static/fonts/` et déclarées en `@font-face` vers leur adresse statique,
+elle aussi versionnée : la feuille de style ne porte que l'URL, le fichier
+est téléchargé une fois puis servi par le cache du navigateur. Une famille
+dont les fichiers manquent, ou toutes si le service statique est désactivé,
+reste chargée depuis Google Fonts, comme auparavant.
+
+La génération est faite au démarrage de l'application si nécessaire, ou à
+l'avance :
+    python -m recoplantes.assets
+"""
+
+import base64
+import hashlib
+import json
+import os
+import shutil
+from functools import lru_cache
+
+from PIL import Image
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS_DIR = os.path.join(ROOT_DIR, "assets")
+STATIC_DIR = os.path.join(ROOT_DIR, "static")
+STATIC_URL = "app/static"
+INDEX_FILE = os.path.join(STATIC_DIR, "assets.json")
+
+# nom : (source, boîte maximale en pixels, qualité WebP)
+IMAGES = {
+    "background": ("background.jpg", (1920, 1280), 60),
+    "imagecss": ("images/imagecss.png", (500, 500), 80),
+    "logo": ("images/logo_recoplantes.jpg", (120, 120), 85),
+}
+# (famille, graisse, fichier dans assets/fonts/)
+FONTS = [
+    ("Roboto", 400, "Roboto-Regular.woff2"),
+    ("Roboto", 700, "Roboto-Bold.woff2"),
+    ("Montserrat", 600, "Montserrat-SemiBold.woff2"),
+]
+GOOGLE_FONTS_URL = "https://fonts.googleapis.com/css2"
+
+MIME_TYPES = {
+    ".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp",
+}
+
+
+def _digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def _is_stale(target, source):
+    return not os.path.isfile(target) or os.path.getmtime(target) < os.path.getmtime(source)
+
+
+def _build_image(source, target, box, quality):
+    with Image.open(source) as img:
+        img.draft("RGB", box)
+        img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+        img.thumbnail(box, Image.LANCZOS, reducing_gap=3.0)
+        tmp_path = f"{target}.tmp"
+        img.save(tmp_path, "WEBP", quality=quality, method=6)
+    os.replace(tmp_path, target)
+
+
+def build_assets(force=False):
+    # Génère les variantes manquantes ou plus anciennes que leur source ; renvoie l'index
+    index = {"images": {}, "fonts": []}
+    os.makedirs(os.path.join(STATIC_DIR, "images"), exist_ok=True)
+    for name, (source, box, quality) in IMAGES.items():
+        source = os.path.join(ASSETS_DIR, source)
+        if not os.path.isfile(source):
+            continue
+        target = os.path.join(STATIC_DIR, "images", f"{name}.webp")
+        if force or _is_stale(target, source):
+            _build_image(source, target, box, quality)
+        index["images"][name] = {
+            "file": f"images/{name}.webp",
+            "version": _digest(target),
+            "bytes": os.path.getsize(target),
+            "source_bytes": os.path.getsize(source),
+        }
+
+    # Polices présentes : copiées telles quelles (le woff2 est déjà compressé)
+    for family, weight, filename in FONTS:
+        source = os.path.join(ASSETS_DIR, "fonts", filename)
+        if not os.path.isfile(source):
+            continue
+        target = os.path.join(STATIC_DIR, "fonts", filename)
+        if force or _is_stale(target, source):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+        index["fonts"].append({
+            "family": family,
+            "weight": weight,
+            "file": f"fonts/{filename}",
+            "version": _digest(target),
+        })
+
+    with open(INDEX_FILE, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def static_url(entry):
+    return f"{STATIC_URL}/{entry['file']}?v={entry['version']}"
+
+
+@lru_cache(maxsize=None)
+def inline_file(path):
+    # Fichier encodé en data URI, une seule fois par processus (images sans service statique)
+    with open(path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode()
+    mime = MIME_TYPES.get(os.path.splitext(path)[1].lower(), "image/png")
+    return f"data:{mime};base64,{encoded}"
+
+
+def font_face_css(index, static_serving=True):
+    # @font-face des polices fournies (police installée, sinon fichier statique), Google Fonts pour les autres
+    bundled = {(font["family"], font["weight"]): font for font in index["fonts"]} if static_serving else {}
+    missing = {}
+    rules = []
+    for family, weight, _ in FONTS:
+        entry = bundled.get((family, weight))
+        if entry is None:
+            missing.setdefault(family, []).append(weight)
+            continue
+        rules.append(
+            f"@font-face {{ font-family: '{family}'; font-style: normal; font-weight: {weight}; "
+            f"font-display: swap; src: local('{family}'), url('{static_url(entry)}') format('woff2'); }}"
+        )
+    if missing:
+        # @import doit précéder toute autre règle de la feuille de style
+        families = "&".join(
+            f"family={family}:wght@{';'.join(str(w) for w in sorted(weights))}" for family, weights in missing.items()
+        )
+        rules.insert(0, f"@import url('{GOOGLE_FONTS_URL}?{families}&display=swap');")
+    return "\n".join(rules)
+
+
+def main():
+    index = build_assets(force=True)
+    for name, entry in index["images"].items():
+        print(f"{name:12s} {entry['source_bytes'] / 1024:9.1f} Ko -> {entry['bytes'] / 1024:7.1f} Ko  {entry['file']}")
+    for font in index["fonts"]:
+        print(f"{font['family']} {font['weight']}  {font['file']}")
+    if len(index["fonts"]) < len(FONTS):
+        print("Polices manquantes dans assets/fonts/ : chargées depuis Google Fonts.")
+
+
+if __name__ == "__main__":
+    main()
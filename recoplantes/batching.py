@@ -0,0 +1,210 @@
+"""
+Micro-batching des inférences entre sessions.
+
+Les requêtes de plusieurs sessions sont regroupées pendant une courte fenêtre
+(`max_wait`) jusqu'à `max_batch` images, puis exécutées en un seul `invoke()`
+sur un interpréteur emprunté au pool. Chaque ligne de la sortie est renvoyée
+à l'appelant correspondant via un `Future`.
+
+Un seul thread forme les batchs : il attend une requête, réserve un
+interpréteur libre, complète le batch puis le confie à un thread
+d'invocation. Tant que tous les interpréteurs travaillent, les requêtes
+s'accumulent dans la file et partent ensemble au batch suivant ; plusieurs
+batchs peuvent tourner en parallèle, un par interpréteur.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from recoplantes.metrics import span
+from recoplantes.signature import ModelSignature
+
+_STOP = object()
+
+
+class EngineClosed(RuntimeError):
+    """Le moteur a été arrêté (modèle déchargé) avant la soumission."""
+
+
+def _batch_bucket(n, max_batch):
+    # Taille de batch arrondie à la puissance de 2 supérieure : limite le nombre
+    # de redimensionnements (resize_tensor_input + allocate_tensors) coûteux
+    bucket = 1
+    while bucket < n:
+        bucket *= 2
+    return min(bucket, max_batch)
+
+
+class MicroBatcher:
+    def __init__(self, pool, max_batch=8, max_wait=0.005, workers=None, name=None, normalizer=None, version=None):
+        self.pool = pool
+        self.name = name or pool.name
+        # Version du modèle servi (empreinte du fichier), renvoyée avec les prédictions
+        self.version = version
+        self.max_wait = max_wait
+
+        with pool.checkout() as interpreter:
+            self.signature = ModelSignature(interpreter, normalizer)
+        self.input_shape = self.signature.input_shape
+        self.max_batch = max(1, max_batch) if self.signature.dynamic_batch else 1
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._images = 0
+        # Durée cumulée des invocations, hors première invocation de chaque interpréteur
+        # (préparation XNNPACK) : latence par batch sans l'attente (recoplantes.adaptive)
+        self._invoke_seconds = 0.0
+        self._timed_invokes = 0
+        self._prepared = set()
+        self._closed = False
+        # Un thread d'invocation par interpréteur du pool, un seul thread pour former les batchs
+        self._executor = ThreadPoolExecutor(max_workers=workers or pool.size, thread_name_prefix=f"invoke-{self.name}")
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, image_array):
+        image_array = np.asarray(image_array)
+        if image_array.shape == (1,) + self.input_shape:
+            image_array = image_array[0]
+        if image_array.shape != self.input_shape:
+            raise ValueError(
+                f"Forme d'entrée {image_array.shape} incompatible avec le modèle {self.input_shape}."
+            )
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise EngineClosed("Le moteur d'inférence est arrêté.")
+            self._queue.put((image_array, future))
+        return future
+
+    def predict(self, image_array, timeout=None):
+        return self.submit(image_array).result(timeout=timeout)
+
+    def predict_many(self, images, timeout=None):
+        # Toutes les images sont mises en file d'un coup : elles partent en batchs complets
+        futures = [self.submit(image) for image in images]
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        return [
+            future.result(timeout=None if deadline is None else max(0.0, deadline - time.perf_counter()))
+            for future in futures
+        ]
+
+    def close(self, wait=False):
+        # Les requêtes déjà en file sont traitées avant le signal d'arrêt
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(_STOP)
+        if wait:
+            self._thread.join()
+            self._executor.shutdown(wait=True)
+
+    def _collect(self, first):
+        # Complète le batch de `first` pendant au plus max_wait
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Signal d'arrêt traité au prochain tour, après ce batch
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        try:
+            while True:
+                first = self._queue.get()
+                if first is _STOP:
+                    return
+                # Interpréteur réservé avant de compléter le batch : s'ils sont tous occupés,
+                # les requêtes suivantes s'accumulent pendant l'attente et partent avec celle-ci
+                try:
+                    interpreter = self.pool.acquire()
+                except Exception as e:
+                    self._fail([first] + self._drain(), e)
+                    continue
+                batch = self._collect(first)
+                try:
+                    self._executor.submit(self._invoke, interpreter, batch)
+                except RuntimeError:
+                    # Threads d'invocation arrêtés à la sortie de l'interpréteur Python
+                    self.pool.release(interpreter)
+                    self._fail(batch + self._drain(), EngineClosed("Le moteur d'inférence est arrêté."))
+                    return
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def _drain(self):
+        # Requêtes en file à cet instant (le signal d'arrêt éventuel y est laissé)
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is _STOP:
+                self._queue.put(_STOP)
+                return items
+            items.append(item)
+
+    @staticmethod
+    def _fail(batch, error):
+        for _, future in batch:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def _invoke(self, interpreter, batch):
+        try:
+            pending = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if not pending:
+                return
+            futures = [future for _, future in pending]
+            bucket = _batch_bucket(len(pending), self.max_batch)
+            start = time.perf_counter()
+            try:
+                with span("invoke", model=self.name):
+                    outputs = self.signature.infer(interpreter, [image for image, _ in pending], bucket)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                return
+            elapsed = time.perf_counter() - start
+            # Comptés avant de réveiller les appelants : stats() inclut déjà ce batch pour eux
+            with self._lock:
+                self._batches += 1
+                self._images += len(futures)
+                if id(interpreter) in self._prepared:
+                    self._invoke_seconds += elapsed
+                    self._timed_invokes += 1
+                else:
+                    self._prepared.add(id(interpreter))
+            for future, row in zip(futures, outputs):
+                future.set_result(row)
+        finally:
+            self.pool.release(interpreter)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_batch": self.max_batch,
+                "queued": self._queue.qsize(),
+                "batches": self._batches,
+                "images": self._images,
+                "avg_batch_size": self._images / self._batches if self._batches else 0.0,
+                "invoke_seconds": self._invoke_seconds,
+                "timed_invokes": self._timed_invokes,
+            }
@@ -0,0 +1,229 @@
+"""
+Banc d'essai de la chaîne de service.
+
+Pour chaque modèle disponible du manifeste, sur les images de `test_images/`
+et sur des photos synthétiques aux dimensions de téléphones :
+- durée de chaque étape (décodage, redimensionnement, normalisation,
+  invocation, post-traitement) en p50 / p95 / p99 ;
+- débit de bout en bout (moteur de service : pool + micro-batching) pour
+  plusieurs niveaux de concurrence ;
+- mémoire résidente ajoutée par chaque modèle, et pic du processus entier
+  (tous modèles confondus).
+
+Les résultats sont écrits en JSON pour comparer les exécutions :
+    python -m recoplantes.benchmark --output bench.json
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from PIL import Image
+
+from recoplantes.interpreter import create_interpreter
+from recoplantes.loader import build_engine
+from recoplantes.manifest import load_manifest
+from recoplantes.memory import current_rss
+from recoplantes.predictor import summarize
+from recoplantes.preprocessing import decode_image, load_image, resize_image
+from recoplantes.signature import ModelSignature
+from recoplantes.tuning import resolve_num_threads
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ["decode", "resize", "normalize", "invoke", "postprocess", "total"]
+
+
+def percentiles(samples):
+    values = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "count": len(values),
+    }
+
+
+def peak_rss():
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def synthetic_jpeg(width, height, seed=0):
+    # Dégradé bruité : se compresse comme une photo, pas comme un aplat
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(height // 16, width // 16, 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def load_corpus(image_dir, synthetic_sizes):
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(image_dir, "*"))):
+        if path.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(path, "rb") as f:
+                corpus.append((os.path.basename(path), f.read()))
+    for i, (width, height) in enumerate(synthetic_sizes):
+        corpus.append((f"synthetic_{width}x{height}.jpg", synthetic_jpeg(width, height, seed=i)))
+    return corpus
+
+
+def bench_stages(spec, corpus, repeats):
+    interpreter = create_interpreter(spec.path, num_threads=resolve_num_threads(spec), xnnpack=spec.xnnpack)
+    signature = ModelSignature(interpreter, spec.preprocessing.normalizer())
+    signature.ensure_batch(interpreter, 1)
+    target_size = signature.input_shape[:2]
+    timings = {stage: [] for stage in STAGES}
+    per_image = {}
+
+    for name, data in corpus:
+        image_totals = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            img = decode_image(io.BytesIO(data), target_size)
+            t1 = time.perf_counter()
+            image = resize_image(img, target_size)
+            t2 = time.perf_counter()
+            signature.write_inputs(interpreter, [image])
+            t3 = time.perf_counter()
+            interpreter.invoke()
+            t4 = time.perf_counter()
+            summarize(signature.read_outputs(interpreter, 1)[0])
+            t5 = time.perf_counter()
+            for stage, duration in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t5 - t0)):
+                timings[stage].append(duration)
+            image_totals.append(t5 - t0)
+        per_image[name] = percentiles(image_totals)
+
+    return {stage: percentiles(samples) for stage, samples in timings.items()}, per_image
+
+
+def bench_throughput(spec, corpus, concurrency, requests):
+    engine = build_engine(spec)
+    target_size = engine.input_shape[:2]
+    results = {}
+    try:
+        for level in concurrency:
+            counter = iter(range(requests))
+            lock = threading.Lock()
+            latencies = []
+
+            def worker():
+                while True:
+                    with lock:
+                        i = next(counter, None)
+                    if i is None:
+                        return
+                    data = corpus[i % len(corpus)][1]
+                    start = time.perf_counter()
+                    engine.predict(load_image(io.BytesIO(data), target_size))
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        latencies.append(elapsed)
+
+            threads = [threading.Thread(target=worker) for _ in range(level)]
+            # Compteurs cumulés du moteur : seule la différence concerne ce niveau
+            before = engine.stats()
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            wall = time.perf_counter() - start
+            after = engine.stats()
+            batches = after["batches"] - before["batches"]
+            images = after["images"] - before["images"]
+            results[str(level)] = {
+                "images_per_s": round(requests / wall, 2),
+                "latency": percentiles(latencies),
+                "batcher": {
+                    "max_batch": after["max_batch"],
+                    "batches": batches,
+                    "images": images,
+                    "avg_batch_size": images / batches if batches else 0.0,
+                },
+            }
+    finally:
+        engine.close()
+    return results
+
+
+def parse_sizes(value):
+    sizes = []
+    for item in value.split(","):
+        if item.strip():
+            width, height = item.lower().split("x")
+            sizes.append((int(width), int(height)))
+    return sizes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des modèles TFLite servis par l'application.")
+    parser.add_argument("--models", nargs="*", help="Modèles du manifeste à mesurer (défaut : tous les disponibles)")
+    parser.add_argument("--images", default=os.path.join(ROOT_DIR, "test_images"), help="Dossier d'images réelles")
+    parser.add_argument("--synthetic", default="4032x3024,8000x6000",
+                        help="Photos synthétiques LxH séparées par des virgules (défaut : 12 et 48 Mpx)")
+    parser.add_argument("--repeats", type=int, default=5, help="Passages par image pour les durées par étape")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Niveaux de concurrence pour le débit")
+    parser.add_argument("--requests", type=int, default=100, help="Requêtes par niveau de concurrence")
+    parser.add_argument("--output", help="Fichier JSON de résultats (défaut : sortie standard)")
+    args = parser.parse_args(argv)
+
+    specs = load_manifest()
+    names = args.models or [name for name, spec in specs.items() if spec.available]
+    corpus = load_corpus(args.images, parse_sizes(args.synthetic))
+    if not corpus:
+        parser.error("Aucune image à mesurer.")
+    concurrency = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "host": {
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "images": [name for name, _ in corpus],
+        "models": {},
+    }
+    for name in names:
+        spec = specs.get(name)
+        if spec is None or not spec.available:
+            report["models"][name] = {"error": "modèle indisponible"}
+            continue
+        print(f"Mesure de {name}...", file=sys.stderr)
+        rss_before = current_rss()
+        stages, per_image = bench_stages(spec, corpus, args.repeats)
+        throughput = bench_throughput(spec, corpus, concurrency, args.requests)
+        report["models"][name] = {
+            "file_bytes": os.path.getsize(spec.path),
+            "stages": stages,
+            "per_image": per_image,
+            "throughput": throughput,
+            "rss_delta_bytes": (current_rss() or 0) - (rss_before or 0),
+        }
+    # Pic du processus entier : tous les modèles mesurés y contribuent
+    report["process_peak_rss_bytes"] = peak_rss()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Cache des prédictions adressé par contenu.
+
+La clé combine le SHA-256 des octets de l'image envoyée, le nom du modèle et
+l'empreinte de son fichier .tflite et de son prétraitement : une même photo (même envoyée par un
+autre utilisateur) n'est décodée et inférée qu'une fois par version de
+modèle. Un LRU en mémoire est complété par un niveau optionnel sur disque
+(SQLite) qui survit aux redémarrages.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def image_digest(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def cache_key(image_sha256, model_name, model_fingerprint):
+    return f"{image_sha256}:{model_name}:{model_fingerprint}"
+
+
+class PredictionCache:
+    def __init__(self, capacity=1024, path=None):
+        self.capacity = capacity
+        self.path = path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, dtype TEXT NOT NULL, proba BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            proba = self._memory.get(key)
+            if proba is not None:
+                self._memory.move_to_end(key)
+                self._memory_hits += 1
+                return proba
+            if self._db is not None:
+                row = self._db.execute("SELECT dtype, proba FROM predictions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    proba = np.frombuffer(row[1], dtype=row[0])
+                    self._remember(key, proba)
+                    self._disk_hits += 1
+                    return proba
+            self._misses += 1
+            return None
+
+    def put(self, key, proba):
+        proba = np.array(proba)
+        proba.flags.writeable = False
+        with self._lock:
+            self._remember(key, proba)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions (key, dtype, proba, created) VALUES (?, ?, ?, ?)",
+                    (key, proba.dtype.str, proba.tobytes(), time.time()),
+                )
+                self._db.commit()
+
+    def _remember(self, key, proba):
+        self._memory[key] = proba
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._memory_hits + self._disk_hits + self._misses
+            return {
+                "entries": len(self._memory),
+                "capacity": self.capacity,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": (self._memory_hits + self._disk_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,100 @@
+"""
+Cascade de modèles à seuil de confiance.
+
+Le modèle le moins coûteux répond d'abord ; si sa probabilité maximale
+atteint le seuil, son résultat est retenu, sinon l'image est transmise au
+modèle suivant (plus lourd). Le dernier modèle de la cascade répond
+toujours. Les modèles indisponibles sont sautés.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from recoplantes.config import get_setting
+from recoplantes.loader import ModelUnavailable
+
+CASCADE_STAGES = [name.strip() for name in get_setting("cascade_stages", "CNN,MobileNetV2,ResNet50").split(",") if name.strip()]
+CASCADE_THRESHOLD = get_setting("cascade_threshold", 0.8, float)
+
+
+class CascadeError(RuntimeError):
+    """Aucun modèle de la cascade n'est disponible."""
+
+
+@dataclass
+class StageResult:
+    name: str
+    confidence: float
+    latency_ms: float
+    version: str = None
+
+
+@dataclass
+class CascadeResult:
+    proba: np.ndarray
+    answered_by: str
+    stages: list = field(default_factory=list)
+
+
+class CascadeStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._answered = {}
+        self._escalations = 0
+        self._total = 0
+
+    def record(self, result):
+        with self._lock:
+            self._total += 1
+            self._answered[result.answered_by] = self._answered.get(result.answered_by, 0) + 1
+            self._escalations += len(result.stages) - 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "total": self._total,
+                "answered_by": dict(self._answered),
+                "answered_share": {name: count / self._total for name, count in self._answered.items()} if self._total else {},
+                "escalations": self._escalations,
+            }
+
+    def collect(self):
+        # Familles de métriques pour `MetricsRegistry.register_collector`
+        stats = self.stats()
+        return [
+            ("reco_cascade_answers_total", "counter", "Analyses de la cascade par étape ayant répondu",
+             [({"model": name}, count) for name, count in stats["answered_by"].items()]),
+            ("reco_cascade_escalations_total", "counter", "Passages à l'étape suivante de la cascade",
+             [({}, stats["escalations"])]),
+        ]
+
+
+def predict_cascade(predictor, image_bytes, stages=None, threshold=CASCADE_THRESHOLD, stats=None, timeout=None):
+    stages = [name for name in (stages or CASCADE_STAGES) if predictor.manager.is_available(name)]
+    if not stages:
+        raise CascadeError("Aucun modèle de la cascade n'est disponible.")
+
+    tried = []
+    proba = None
+    for position, name in enumerate(stages):
+        start = time.perf_counter()
+        try:
+            prediction = predictor.predict(name, image_bytes, timeout=timeout)
+        except ModelUnavailable:
+            # Modèle présent mais non chargeable : on passe à l'étape suivante
+            continue
+        proba = prediction.proba
+        confidence = float(np.max(proba))
+        tried.append(StageResult(name, confidence, 1000 * (time.perf_counter() - start), prediction.version))
+        if confidence >= threshold or position == len(stages) - 1:
+            break
+    if not tried:
+        raise CascadeError("Aucun modèle de la cascade n'a pu être chargé.")
+
+    result = CascadeResult(proba, tried[-1].name, tried)
+    if stats is not None:
+        stats.record(result)
+    return result
@@ -0,0 +1,18 @@
+"""
+Lecture des paramètres de service depuis les variables d'environnement.
+
+Chaque paramètre `nom` est lu dans la variable `RECO_NOM` ; la valeur par
+défaut est utilisée si la variable est absente ou invalide.
+"""
+
+import os
+
+
+def get_setting(name, default, cast=str):
+    value = os.environ.get(f"RECO_{name.upper()}")
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        return default
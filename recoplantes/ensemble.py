@@ -0,0 +1,85 @@
+"""
+Prédiction par ensemble de modèles.
+
+Les modèles sélectionnés tournent en parallèle, chacun sur ses propres
+interpréteurs avec sa taille d'entrée et son prétraitement ; leurs vecteurs
+de probabilités sont combinés par moyenne pondérée. La durée totale est
+donc proche de celle du modèle le plus lent, et non de leur somme.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from recoplantes.config import get_setting
+
+ENSEMBLE_WORKERS = get_setting("ensemble_workers", 8, int)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class EnsembleError(RuntimeError):
+    """Aucun modèle de l'ensemble n'a pu répondre."""
+
+
+@dataclass
+class MemberResult:
+    name: str
+    weight: float
+    latency_ms: float
+    proba: np.ndarray = None
+    error: str = None
+    version: str = None
+
+
+@dataclass
+class EnsembleResult:
+    proba: np.ndarray
+    members: list
+    latency_ms: float
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ENSEMBLE_WORKERS, thread_name_prefix="ensemble")
+        return _executor
+
+
+def predict_ensemble(predictor, model_names, image_bytes, weights=None, executor=None, timeout=None):
+    if not model_names:
+        raise EnsembleError("Aucun modèle sélectionné pour l'ensemble.")
+    executor = executor or _get_executor()
+    weights = weights or {name: predictor.manager.specs[name].ensemble_weight for name in model_names}
+
+    def run(name):
+        start = time.perf_counter()
+        prediction = predictor.predict(name, image_bytes, timeout=timeout)
+        return prediction, 1000 * (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    futures = {name: executor.submit(run, name) for name in model_names}
+    members = []
+    for name, future in futures.items():
+        try:
+            prediction, latency_ms = future.result()
+        except Exception as e:
+            members.append(MemberResult(name, weights[name], 1000 * (time.perf_counter() - start), error=str(e)))
+        else:
+            members.append(MemberResult(name, weights[name], latency_ms, proba=prediction.proba,
+                                        version=prediction.version))
+    latency_ms = 1000 * (time.perf_counter() - start)
+
+    answered = [m for m in members if m.proba is not None and m.weight > 0]
+    if not answered:
+        errors = "; ".join(f"{m.name} : {m.error}" for m in members if m.error)
+        raise EnsembleError(f"Aucun modèle de l'ensemble n'a pu répondre ({errors}).")
+    # Les poids sont renormalisés sur les modèles qui ont répondu
+    total = sum(m.weight for m in answered)
+    proba = sum(m.weight * np.asarray(m.proba, dtype=np.float32) for m in answered) / total
+    return EnsembleResult(proba, members, latency_ms)
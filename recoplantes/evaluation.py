@@ -0,0 +1,92 @@
+"""
+Évaluation des modèles sur un échantillon d'images.
+
+Sert à l'export TFLite (écart de précision de chaque variante) et à la
+validation des artefacts face au modèle Keras d'origine. Les échantillons
+sont tirés de façon reproductible, avec le même nombre d'images par classe,
+dans un dossier organisé comme `Data/color_split_light/<split>/<classe>/`.
+"""
+
+import glob
+import os
+import random
+import time
+
+import numpy as np
+
+from recoplantes.interpreter import create_interpreter
+from recoplantes.labels import LABELS
+from recoplantes.preprocessing import load_image
+from recoplantes.signature import ModelSignature
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def stratified_sample(split_dir, per_class, seed=42):
+    # (chemin, indice de classe) : per_class images tirées au hasard dans chaque dossier de classe
+    rng = random.Random(seed)
+    samples = []
+    for label in sorted(os.listdir(split_dir)):
+        class_dir = os.path.join(split_dir, label)
+        if not os.path.isdir(class_dir):
+            continue
+        if label not in LABELS.index:
+            raise ValueError(f"Dossier de classe inconnu dans {split_dir} : {label}")
+        files = sorted(f for f in os.listdir(class_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+        for name in rng.sample(files, min(per_class, len(files))):
+            samples.append((os.path.join(class_dir, name), LABELS.index[label]))
+    return samples
+
+
+def unlabeled_images(image_dir):
+    return [(path, None) for path in sorted(glob.glob(os.path.join(image_dir, "*")))
+            if path.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def load_images(samples, target_size):
+    return np.stack([load_image(path, target_size) for path, _ in samples])
+
+
+def keras_predict(keras_model, images, normalizer):
+    # Une image par appel : latence comparable à celle du service
+    inputs = np.empty((1,) + images.shape[1:], dtype=np.float32)
+    normalizer(images[0], inputs[0])
+    keras_model(inputs, training=False)  # première exécution (traçage) non chronométrée
+    probas, latencies = [], []
+    for image in images:
+        start = time.perf_counter()
+        normalizer(image, inputs[0])
+        probas.append(np.asarray(keras_model(inputs, training=False))[0])
+        latencies.append(time.perf_counter() - start)
+    return np.stack(probas), np.asarray(latencies)
+
+
+def tflite_input_size(model_path):
+    return ModelSignature(create_interpreter(model_path, num_threads=1)).input_shape[:2]
+
+
+def tflite_predict(model_path, images, normalizer, num_threads=1):
+    interpreter = create_interpreter(model_path, num_threads=num_threads)
+    signature = ModelSignature(interpreter, normalizer)
+    signature.ensure_batch(interpreter, 1)
+    signature.infer(interpreter, [images[0]], 1)
+    probas, latencies = [], []
+    for image in images:
+        start = time.perf_counter()
+        probas.append(signature.infer(interpreter, [image], 1)[0])
+        latencies.append(time.perf_counter() - start)
+    return np.stack(probas), np.asarray(latencies)
+
+
+def accuracy(probas, labels):
+    labels = np.asarray(labels)
+    return float(np.mean(np.argmax(probas, axis=1) == labels))
+
+
+def latency_summary(latencies):
+    values = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+    }
@@ -0,0 +1,233 @@
+"""
+Export des modèles Keras en TFLite et quantification post-entraînement.
+
+Quatre variantes peuvent être produites à partir d'un checkpoint `.keras` :
+- `float32` : conversion directe ;
+- `float16` : poids stockés en float16 (fichier deux fois plus petit) ;
+- `dynamic` : poids int8, activations calculées en float (dynamic range) ;
+- `int8` : poids et activations int8, calibrés sur un échantillon stratifié
+  de `Data/color_split_light/train` (même nombre d'images par classe). Seules
+  les opérations int8 sont autorisées : si une couche ne peut pas être
+  quantifiée, la variante n'est pas produite et le rapport indique les
+  opérations restées en float.
+
+Par défaut, le prétraitement déclaré dans le manifeste (`preprocessing`) est
+ajouté devant le modèle : conversion en float32, redimensionnement éventuel,
+permutation des canaux et normalisation. Le graphe exporté reçoit alors
+l'image uint8 brute ; l'application le détecte à son entrée uint8 non
+quantifiée et copie l'image telle quelle, sans calcul flottant côté Python.
+
+Chaque exécution écrit un rapport JSON : taille, latence et écart de
+précision de chaque variante par rapport au modèle Keras, mesurés sur
+`Data/color_split_light/test`.
+
+Exemple (TensorFlow requis, depuis la racine du dépôt) :
+    python -m recoplantes.export model_resnet_v7_best.keras --model ResNet50 \\
+        --output-dir models/export --report models/export/resnet_v7.json
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import tensorflow as tf
+
+from recoplantes.evaluation import (
+    accuracy, keras_predict, latency_summary, load_images, stratified_sample, tflite_predict,
+)
+from recoplantes.manifest import load_manifest
+from recoplantes.preprocessing import load_image
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VARIANTS = ("float32", "float16", "dynamic", "int8")
+
+
+def parse_size(value):
+    height, width = value.lower().split("x")
+    return int(height), int(width)
+
+
+def build_serving_function(keras_model, preprocessing=None, input_size=None):
+    model_size = tuple(int(d) for d in keras_model.input_shape[1:3])
+    if preprocessing is None:
+        # Sans prétraitement intégré : entrée float déjà normalisée par l'application
+        @tf.function(input_signature=[tf.TensorSpec([None, *model_size, 3], tf.float32, name="image")])
+        def serve_float(image):
+            return {"proba": keras_model(image, training=False)}
+        return serve_float
+
+    input_size = tuple(input_size or model_size)
+    normalizer = preprocessing.normalizer()
+    channels = list(normalizer.channels)
+    mean = tf.constant(normalizer.mean, dtype=tf.float32)
+    scale = tf.constant(normalizer.scale, dtype=tf.float32)
+
+    @tf.function(input_signature=[tf.TensorSpec([None, *input_size, 3], tf.uint8, name="image")])
+    def serve(image):
+        x = tf.cast(image, tf.float32)
+        if input_size != model_size:
+            # Redimensionnement dans le graphe : l'application envoie des images input_size
+            x = tf.image.resize(x, model_size, method="bilinear")
+        if channels != [0, 1, 2]:
+            x = tf.gather(x, channels, axis=-1)
+        x = (x - mean) * scale
+        return {"proba": keras_model(x, training=False)}
+
+    return serve
+
+
+class QuantizationError(ValueError):
+    """Le modèle ne peut pas être entièrement quantifié en int8."""
+
+
+def convert(keras_model, preprocessing=None, input_size=None, optimizations=None, representative_dataset=None,
+            supported_types=None, supported_ops=None):
+    serve = build_serving_function(keras_model, preprocessing, input_size)
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([serve.get_concrete_function()], keras_model)
+    if optimizations:
+        converter.optimizations = optimizations
+    if representative_dataset is not None:
+        converter.representative_dataset = representative_dataset
+    if supported_types:
+        converter.target_spec.supported_types = supported_types
+    if supported_ops:
+        converter.target_spec.supported_ops = supported_ops
+    return converter.convert()
+
+
+def representative_dataset(samples, target_size, normalizer=None):
+    # Images de calibration au format de l'entrée du graphe (uint8 brut si prétraitement inclus)
+    def generate():
+        for path, _ in samples:
+            image = load_image(path, target_size)
+            if normalizer is None:
+                yield [image[np.newaxis]]
+            else:
+                inputs = np.empty((1,) + image.shape, dtype=np.float32)
+                normalizer(image, inputs[0])
+                yield [inputs]
+    return generate
+
+
+def convert_variant(keras_model, variant, preprocessing=None, input_size=None, calibration=None):
+    if variant == "float32":
+        return convert(keras_model, preprocessing, input_size)
+    if variant == "float16":
+        return convert(keras_model, preprocessing, input_size, optimizations=[tf.lite.Optimize.DEFAULT],
+                       supported_types=[tf.float16])
+    if variant == "dynamic":
+        return convert(keras_model, preprocessing, input_size, optimizations=[tf.lite.Optimize.DEFAULT])
+    if variant == "int8":
+        if calibration is None:
+            raise ValueError("La variante int8 nécessite un jeu de calibration.")
+        # Entrées et sorties restent en float/uint8 brut : seules les couches internes sont quantifiées,
+        # toutes sans exception (une opération non quantifiable fait échouer la conversion)
+        try:
+            return convert(keras_model, preprocessing, input_size, optimizations=[tf.lite.Optimize.DEFAULT],
+                           representative_dataset=calibration,
+                           supported_ops=[tf.lite.OpsSet.TFLITE_BUILTINS_INT8])
+        except Exception as e:
+            # Le message du convertisseur liste les opérations sans noyau int8
+            raise QuantizationError(str(e).strip()) from e
+    raise ValueError(f"Variante inconnue : {variant} (connues : {', '.join(VARIANTS)})")
+
+
+def write_model(tflite_model, output):
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(tflite_model)
+    os.replace(tmp_path, output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export d'un modèle Keras en variantes TFLite (float32, float16, dynamic, int8).")
+    parser.add_argument("keras_model", help="Fichier .keras ou .h5 à convertir")
+    parser.add_argument("--model", required=True, help="Nom du modèle dans models/manifest.json (prétraitement)")
+    parser.add_argument("--output-dir", default=os.path.join(ROOT_DIR, "models", "export"), help="Dossier des .tflite produits")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="Variantes à produire, séparées par des virgules")
+    parser.add_argument("--data", default=os.path.join(ROOT_DIR, "Data", "color_split_light"),
+                        help="Jeu découpé en train/val/test (calibration et mesure de précision)")
+    parser.add_argument("--calibration-per-class", type=int, default=4, help="Images de calibration int8 par classe")
+    parser.add_argument("--eval-per-class", type=int, default=10, help="Images de test par classe (0 = pas de mesure)")
+    parser.add_argument("--input-size", type=parse_size, help="Taille HxL des images reçues, si différente de celle du modèle")
+    parser.add_argument("--no-fold", action="store_true", help="Ne pas inclure le prétraitement (entrée float normalisée)")
+    parser.add_argument("--report", help="Rapport JSON (défaut : <output-dir>/<nom>_report.json)")
+    args = parser.parse_args(argv)
+
+    spec = load_manifest().get(args.model)
+    if spec is None:
+        parser.error(f"Modèle inconnu : {args.model}")
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = [v for v in variants if v not in VARIANTS]
+    if unknown:
+        parser.error(f"Variantes inconnues : {', '.join(unknown)} (connues : {', '.join(VARIANTS)})")
+
+    if args.no_fold and args.input_size:
+        parser.error("--input-size nécessite le prétraitement intégré (incompatible avec --no-fold).")
+
+    keras_model = tf.keras.models.load_model(args.keras_model, compile=False)
+    normalizer = spec.preprocessing.normalizer()
+    model_size = tuple(int(d) for d in keras_model.input_shape[1:3])
+    input_size = tuple(args.input_size or model_size)
+    folded = None if args.no_fold else spec.preprocessing
+
+    calibration = None
+    if "int8" in variants:
+        samples = stratified_sample(os.path.join(args.data, "train"), args.calibration_per_class)
+        if not samples:
+            parser.error(f"Aucune image de calibration dans {args.data}/train.")
+        calibration = representative_dataset(samples, input_size, None if folded else normalizer)
+
+    eval_samples = []
+    if args.eval_per_class:
+        eval_samples = stratified_sample(os.path.join(args.data, "test"), args.eval_per_class)
+    report = {
+        "keras_model": os.path.abspath(args.keras_model),
+        "model": args.model,
+        "preprocessing_folded": folded is not None,
+        "input_size": list(input_size),
+        "eval_images": len(eval_samples),
+        "variants": {},
+    }
+    if eval_samples:
+        # Référence Keras : images à la taille du modèle, prétraitement du manifeste sur l'hôte
+        labels = [label for _, label in eval_samples]
+        keras_probas, keras_latencies = keras_predict(keras_model, load_images(eval_samples, model_size), normalizer)
+        report["keras"] = {"accuracy": accuracy(keras_probas, labels), "latency": latency_summary(keras_latencies)}
+        eval_images = load_images(eval_samples, input_size)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(args.keras_model))[0]
+    for variant in variants:
+        print(f"Conversion {variant}...", file=sys.stderr)
+        output = os.path.join(args.output_dir, f"{stem}_{variant}.tflite")
+        try:
+            tflite_model = convert_variant(keras_model, variant, folded, input_size, calibration)
+        except QuantizationError as e:
+            report["variants"][variant] = {"error": "Quantification int8 complète impossible", "converter": str(e)}
+            print(f"  {variant} non produite, opérations non quantifiables :\n{e}", file=sys.stderr)
+            continue
+        write_model(tflite_model, output)
+        entry = {"path": os.path.relpath(output, ROOT_DIR), "bytes": os.path.getsize(output)}
+        if eval_samples:
+            probas, latencies = tflite_predict(output, eval_images, normalizer)
+            entry["accuracy"] = accuracy(probas, labels)
+            entry["accuracy_delta"] = round(entry["accuracy"] - report["keras"]["accuracy"], 4)
+            entry["latency"] = latency_summary(latencies)
+        report["variants"][variant] = entry
+        print(f"  {entry['path']} : {entry['bytes'] / 1e6:.1f} Mo"
+              + (f", précision {entry['accuracy']:.1%} ({entry['accuracy_delta']:+.1%}), "
+                 f"p50 {entry['latency']['p50_ms']:.1f} ms" if eval_samples else ""),
+              file=sys.stderr)
+
+    report_path = args.report or os.path.join(args.output_dir, f"{stem}_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Rapport : {report_path}. Pour servir une variante, indiquez-la dans le champ \"path\" "
+          f"de {args.model} dans models/manifest.json.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
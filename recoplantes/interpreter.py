@@ -0,0 +1,35 @@
+"""
+Création des interpréteurs TFLite.
+
+`num_threads` fixe le nombre de threads d'un interpréteur (None = défaut
+TFLite) ; `xnnpack=False` désactive le délégué XNNPACK appliqué par défaut.
+"""
+
+import os
+
+from tflite_runtime.interpreter import Interpreter, OpResolverType
+
+
+def create_interpreter(model_path, num_threads=None, xnnpack=True):
+    resolver = OpResolverType.AUTO if xnnpack else OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    interpreter = Interpreter(
+        model_path=model_path,
+        num_threads=num_threads,
+        experimental_op_resolver_type=resolver,
+    )
+    interpreter.allocate_tensors()
+    return interpreter
+
+
+class PinnedModel:
+    """Fichier du modèle gardé ouvert : les interpréteurs créés ensuite lisent la même
+    version, même si le fichier a été remplacé entre-temps (`os.replace`)."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        fd_path = f"/proc/self/fd/{self._file.fileno()}"
+        # Sans /proc (hors Linux), on relit le chemin d'origine
+        self.path = fd_path if os.path.exists(fd_path) else path
+
+    def close(self):
+        self._file.close()
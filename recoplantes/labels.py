@@ -0,0 +1,91 @@
+"""
+Registre des classes prédites par les modèles (38 classes PlantVillage).
+
+`models/labels.json` décrit chaque classe dans l'ordre des sorties des
+modèles : nom du dossier d'entraînement (`label`), nom affiché (`name`) et,
+pour les maladies, symptômes, impact, traitement et prévention. Le fichier
+est lu une seule fois ; le diagnostic et le bloc HTML de recommandations de
+chaque classe sont préparés au chargement et retrouvés par indice de sortie.
+"""
+
+import html
+import json
+import os
+from dataclasses import dataclass
+
+LABELS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "labels.json")
+
+DETAIL_FIELDS = (
+    ("symptoms", "Symptômes"),
+    ("impact", "Impact"),
+    ("treatment", "Traitement"),
+    ("prevention", "Prévention"),
+)
+
+
+class LabelMismatch(ValueError):
+    """Le nombre de sorties d'un modèle ne correspond pas au registre des classes."""
+
+
+@dataclass(frozen=True)
+class ClassInfo:
+    index: int
+    label: str
+    name: str
+    healthy: bool
+    details: dict
+    diagnosis: str
+    recommendations_html: str
+
+
+def _render_recommendations(healthy, details):
+    if healthy:
+        return "<strong>Aucune action nécessaire.</strong>"
+    if not details:
+        return "Aucune recommandation disponible. Veuillez consulter un expert agricole."
+    return "<br>".join(
+        f"<strong>{title} :</strong> {html.escape(details[key])}" for key, title in DETAIL_FIELDS if key in details
+    )
+
+
+class LabelRegistry:
+    def __init__(self, entries):
+        self.classes = []
+        for index, entry in enumerate(entries):
+            name = entry.get("name") or " ".join(entry["label"].replace("_", " ").split())
+            healthy = "healthy" in name.lower()
+            details = {key: entry[key] for key, _ in DETAIL_FIELDS if entry.get(key)}
+            diagnosis = "Feuille en bonne santé." if healthy else f"Maladie détectée - {name}."
+            self.classes.append(ClassInfo(
+                index=index,
+                label=entry["label"],
+                name=name,
+                healthy=healthy,
+                details=details,
+                diagnosis=diagnosis,
+                recommendations_html=_render_recommendations(healthy, details),
+            ))
+        self.labels = [info.label for info in self.classes]
+        self.index = {info.label: info.index for info in self.classes}
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __getitem__(self, index):
+        return self.classes[index]
+
+    def check_output(self, num_classes, model_name=""):
+        if num_classes != len(self.classes):
+            raise LabelMismatch(
+                f"Le modèle {model_name} produit {num_classes} sorties pour {len(self.classes)} classes connues."
+            )
+
+
+def load_labels(path=LABELS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return LabelRegistry(json.load(f)["classes"])
+
+
+LABELS = load_labels()
+# Noms des dossiers d'entraînement, dans l'ordre des sorties des modèles
+CLASS_NAMES = LABELS.labels
@@ -0,0 +1,326 @@
+"""
+Chargement à la demande des modèles et cache LRU borné en mémoire.
+
+Aucun modèle n'est chargé au démarrage : le moteur d'inférence d'un modèle
+est construit lors de sa première sélection, puis conservé dans un LRU dont
+l'empreinte totale est limitée par un budget mémoire. Les modèles les moins
+récemment utilisés, ou inactifs depuis trop longtemps, sont déchargés.
+
+En mode multi-processus (`recoplantes.workers`), `preload_interpreters`
+construit un interpréteur par modèle avant le fork : chaque worker le reprend
+comme premier interpréteur de son pool, et les poids préparés restent
+partagés en copie sur écriture entre les workers.
+
+Avec `RECO_REMOTE_INFERENCE=1`, chaque modèle chargé tourne dans son propre
+processus, alimenté par mémoire partagée (`recoplantes.transport`).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from recoplantes.batching import EngineClosed, MicroBatcher
+from recoplantes.config import get_setting
+from recoplantes.interpreter import PinnedModel, create_interpreter
+from recoplantes.labels import LABELS
+from recoplantes.memory import current_rss
+from recoplantes.pool import InterpreterPool
+from recoplantes.transport import RemoteEngine
+from recoplantes.tuning import probe_in_background, resolve_num_threads
+
+# Taille du pool d'interpréteurs par modèle (défaut : cœurs / threads par interpréteur)
+# et délai d'attente d'un interpréteur libre
+POOL_SIZE = get_setting("pool_size", None, int)
+POOL_TIMEOUT = get_setting("pool_timeout", 30.0, float)
+# Micro-batching : taille maximale d'un batch et fenêtre de regroupement des requêtes
+MAX_BATCH = get_setting("max_batch", 8, int)
+MAX_WAIT_MS = get_setting("max_wait_ms", 5.0, float)
+# Budget mémoire des modèles chargés et durée d'inactivité avant déchargement (0 = jamais)
+MEMORY_BUDGET_MB = get_setting("model_memory_mb", 1536, int)
+IDLE_SECONDS = get_setting("model_idle_seconds", 1800.0, float)
+# Inférence hors du processus de l'interface : slots de mémoire partagée par modèle
+REMOTE_INFERENCE = bool(get_setting("remote_inference", 0, int))
+TRANSPORT_SLOTS = get_setting("transport_slots", 16, int)
+# Durée de validité de la mémoire mesurée d'un processus d'inférence (s)
+FOOTPRINT_REFRESH = 5.0
+
+
+class ModelUnavailable(RuntimeError):
+    """Le fichier du modèle est absent ou n'a pas pu être chargé."""
+
+
+def check_input_size(signature, spec):
+    expected = spec.preprocessing.input_size
+    if expected is not None and tuple(expected) != tuple(signature.input_shape[:2]):
+        raise ValueError(
+            f"Le modèle {spec.name} attend des images {signature.input_shape[0]}x{signature.input_shape[1]}, "
+            f"le manifeste déclare {expected[0]}x{expected[1]}."
+        )
+
+
+# Interpréteurs construits avant le fork, repris une seule fois par le premier pool du modèle
+_PRELOADED = {}
+
+
+def preload_interpreters(specs, names=None):
+    # Un seul thread : aucun pool de threads TFLite/XNNPACK ne doit exister au moment du fork
+    for name in names or [name for name, spec in specs.items() if spec.available]:
+        spec = specs[name]
+        _PRELOADED[name] = (spec.sha256, create_interpreter(spec.path, num_threads=1, xnnpack=spec.xnnpack))
+    return list(_PRELOADED)
+
+
+def tune_threads(spec):
+    # Sonde de threads hors du chemin des requêtes (préchauffage, préchargement des workers)
+    return resolve_num_threads(spec)
+
+
+def plan_pool(num_threads, pool_size=POOL_SIZE, cpu_count=None):
+    # (threads par interpréteur, taille du pool) : sous charge, tous les interpréteurs du pool
+    # invoquent en même temps, on vise au plus un thread TFLite par cœur
+    cpu_count = cpu_count or os.cpu_count() or 1
+    if pool_size is None:
+        return num_threads, max(1, cpu_count // num_threads)
+    return max(1, min(num_threads, cpu_count // pool_size)), pool_size
+
+
+def build_engine(spec):
+    tuned = resolve_num_threads(spec, probe=False)
+    if tuned is None:
+        # Pas encore réglé : sonde en arrière-plan, réglage pris en compte au prochain chargement
+        probe_in_background(spec)
+        tuned = 1
+    num_threads, pool_size = plan_pool(tuned)
+    preloaded = []
+    if spec.name in _PRELOADED:
+        sha256, interpreter = _PRELOADED.pop(spec.name)
+        # Interpréteur d'une version antérieure du fichier (rechargé depuis) : ignoré
+        if sha256 == spec.sha256:
+            preloaded.append(interpreter)
+    # Les interpréteurs ajoutés plus tard au pool lisent la version chargée ici
+    model = PinnedModel(spec.path)
+
+    def factory():
+        if preloaded:
+            return preloaded.pop()
+        return create_interpreter(model.path, num_threads=num_threads, xnnpack=spec.xnnpack)
+
+    pool = InterpreterPool(
+        factory,
+        size=pool_size,
+        timeout=POOL_TIMEOUT,
+        name=spec.name,
+    )
+    pool.prefill(1)
+    engine = MicroBatcher(
+        pool, max_batch=MAX_BATCH, max_wait=MAX_WAIT_MS / 1000, normalizer=spec.preprocessing.normalizer(),
+        version=spec.version,
+    )
+    try:
+        LABELS.check_output(engine.signature.num_classes, spec.name)
+        check_input_size(engine.signature, spec)
+    except ValueError:
+        engine.close()
+        raise
+    return engine
+
+
+def build_remote_engine(spec):
+    # Le worker construit le moteur local (build_engine) et vérifie lui-même le modèle
+    return RemoteEngine(spec, build_engine, slots=TRANSPORT_SLOTS, timeout=POOL_TIMEOUT)
+
+
+def close_in_background(engines):
+    # Un moteur distant attend la fin de son processus : arrêt hors du chemin des requêtes
+    engines = list(engines)
+    if engines:
+        threading.Thread(
+            target=lambda: [engine.close() for engine in engines], name="engine-close", daemon=True,
+        ).start()
+
+
+class _Entry:
+    def __init__(self, engine, unit_bytes):
+        self.engine = engine
+        # Empreinte mesurée d'un interpréteur ; le pool peut en créer plusieurs
+        self.unit_bytes = unit_bytes
+        self.last_used = time.monotonic()
+        self._sampled = (0.0, None)
+
+    @property
+    def footprint(self):
+        if isinstance(self.engine, RemoteEngine):
+            # Moteur dans un autre processus : mémoire propre du worker, relue au plus toutes les
+            # FOOTPRINT_REFRESH secondes (lecture de /proc sous le verrou du gestionnaire)
+            sampled_at, memory = self._sampled
+            if time.monotonic() - sampled_at >= FOOTPRINT_REFRESH:
+                memory = self.engine.memory_bytes()
+                self._sampled = (time.monotonic(), memory)
+            return memory or self.unit_bytes
+        return self.unit_bytes * max(1, self.engine.pool.stats()["created"])
+
+
+class ModelManager:
+    def __init__(self, specs, build=None, memory_budget=MEMORY_BUDGET_MB * 1024 ** 2,
+                 idle_seconds=IDLE_SECONDS):
+        self.specs = specs
+        self.memory_budget = memory_budget
+        self.idle_seconds = idle_seconds
+        self._build = build or (build_remote_engine if REMOTE_INFERENCE else build_engine)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in specs}
+        self._loads = 0
+        self._evictions = 0
+        self._reloads = 0
+
+    def is_available(self, name):
+        spec = self.specs.get(name)
+        return spec is not None and spec.available
+
+    def is_loaded(self, name):
+        with self._lock:
+            return name in self._entries
+
+    def get(self, name):
+        if not self.is_available(name):
+            raise ModelUnavailable(f"Le modèle {name} n'est pas disponible.")
+        with self._lock:
+            entry = self._touch(name)
+        if entry is None:
+            # Un seul chargement par modèle, même si plusieurs sessions le demandent
+            with self._load_locks[name]:
+                with self._lock:
+                    entry = self._touch(name)
+                if entry is None:
+                    entry = self._load(name)
+        self._evict(keep=name)
+        return entry.engine
+
+    def predict(self, name, image_array, timeout=None):
+        # (probabilités, version du modèle qui a répondu)
+        engine = self.get(name)
+        try:
+            return engine.predict(image_array, timeout=timeout), engine.version
+        except EngineClosed:
+            # Modèle déchargé, remplacé (rechargement) ou processus d'inférence arrêté
+            # entre get() et la soumission : on réessaie une fois sur le moteur courant
+            self._discard(name, engine)
+            engine = self.get(name)
+            return engine.predict(image_array, timeout=timeout), engine.version
+
+    def predict_many(self, name, images, timeout=None):
+        engine = self.get(name)
+        try:
+            return engine.predict_many(images, timeout=timeout), engine.version
+        except EngineClosed:
+            self._discard(name, engine)
+            engine = self.get(name)
+            return engine.predict_many(images, timeout=timeout), engine.version
+
+    def reload(self, spec, prepare=None):
+        # Nouvelle version construite (et préparée, ex. préchauffée) à côté de l'ancienne,
+        # puis échangée d'un coup ; les requêtes déjà soumises finissent sur l'ancienne.
+        # Renvoie le nouveau moteur, ou None si le modèle n'était pas chargé.
+        # Un nom encore inconnu (nouvelle entrée du manifeste) est simplement enregistré.
+        name = spec.name
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            if not self.is_loaded(name):
+                with self._lock:
+                    if name in self.specs:
+                        self.specs[name] = spec
+                    else:
+                        # Copie plutôt qu'ajout : les sessions parcourent ce dictionnaire sans verrou
+                        self.specs = {**self.specs, name: spec}
+                return None
+            entry = self._create_entry(spec)
+            if prepare is not None:
+                try:
+                    prepare(entry.engine)
+                except Exception:
+                    entry.engine.close()
+                    raise
+            with self._lock:
+                previous = self._entries.get(name)
+                self._entries[name] = entry
+                self._entries.move_to_end(name)
+                self.specs[name] = spec
+                self._reloads += 1
+        if previous is not None:
+            # Les requêtes déjà soumises se terminent sans bloquer l'appelant (surveillance)
+            close_in_background([previous.engine])
+        self._evict(keep=name)
+        return entry.engine
+
+    def _discard(self, name, engine):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.engine is not engine:
+                return
+            del self._entries[name]
+        close_in_background([engine])
+
+    def _touch(self, name):
+        entry = self._entries.get(name)
+        if entry is not None:
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(name)
+        return entry
+
+    def _create_entry(self, spec):
+        rss_before = current_rss()
+        try:
+            engine = self._build(spec)
+        except Exception as e:
+            raise ModelUnavailable(f"Le modèle {spec.name} n'a pas pu être chargé : {e}") from e
+        rss_after = current_rss()
+        measured = rss_after - rss_before if rss_before is not None and rss_after is not None else 0
+        return _Entry(engine, max(measured, os.path.getsize(spec.path)))
+
+    def _load(self, name):
+        entry = self._create_entry(self.specs[name])
+        with self._lock:
+            self._entries[name] = entry
+            self._loads += 1
+        return entry
+
+    def _evict(self, keep=None):
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            # Modèles inactifs depuis trop longtemps
+            if self.idle_seconds > 0:
+                for name, entry in list(self._entries.items()):
+                    if name != keep and now - entry.last_used > self.idle_seconds:
+                        evicted.append(self._entries.pop(name))
+            # Puis les moins récemment utilisés tant que le budget est dépassé
+            while sum(e.footprint for e in self._entries.values()) > self.memory_budget:
+                name = next((n for n in self._entries if n != keep), None)
+                if name is None:
+                    break
+                evicted.append(self._entries.pop(name))
+            self._evictions += len(evicted)
+        # Les requêtes déjà soumises se terminent avant l'arrêt des threads
+        close_in_background(entry.engine for entry in evicted)
+
+    def engines(self):
+        with self._lock:
+            return {name: entry.engine for name, entry in self._entries.items()}
+
+    def stats(self):
+        with self._lock:
+            loaded = {name: entry.footprint for name, entry in self._entries.items()}
+            return {
+                "loaded": list(loaded),
+                "footprint_bytes": loaded,
+                "total_bytes": sum(loaded.values()),
+                "budget_bytes": self.memory_budget,
+                "loads": self._loads,
+                "evictions": self._evictions,
+                "reloads": self._reloads,
+                "versions": {name: entry.engine.version for name, entry in self._entries.items()},
+                "unavailable": [name for name, spec in self.specs.items() if not spec.available],
+            }
@@ -0,0 +1,109 @@
+"""
+Manifeste des modèles servis (models/manifest.json).
+
+Chaque entrée associe le nom affiché dans l'application au fichier .tflite
+(chemin relatif au dossier du manifeste) et à sa description, ainsi qu'aux
+options d'exécution : `num_threads` (entier, ou "auto" pour le choisir par
+sonde au premier chargement), `xnnpack` (délégué XNNPACK actif ou non) et
+`ensemble_weight` (poids du modèle dans le mode Ensemble).
+
+`preprocessing` décrit l'entrée attendue par le modèle : `input_size`
+([hauteur, largeur], vérifiée au chargement), `channel_order` ("RGB" ou
+"BGR") et `normalization` (préréglage `rescale`, `tf`, `caffe` ou `none`,
+éventuellement précisé par `mean` et `scale` par canal de sortie).
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from functools import cached_property
+
+from recoplantes.preprocessing import Normalizer
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "manifest.json")
+
+
+@dataclass(frozen=True)
+class PreprocessingSpec:
+    input_size: tuple = None
+    channel_order: str = None
+    normalization: str = "rescale"
+    mean: tuple = None
+    scale: tuple = None
+
+    def normalizer(self):
+        return Normalizer.from_preset(self.normalization, self.channel_order, self.mean, self.scale)
+
+    @property
+    def key(self):
+        # Identifie la transformation (fait partie de la clé du cache de prédictions)
+        normalizer = self.normalizer()
+        order = "".join("RGB"[c] for c in normalizer.channels)
+        return f"{self.input_size}:{order}:{normalizer.mean}:{normalizer.scale}"
+
+
+def _parse_preprocessing(entry):
+    if not entry:
+        return PreprocessingSpec()
+    spec = PreprocessingSpec(
+        input_size=tuple(int(d) for d in entry["input_size"]) if entry.get("input_size") else None,
+        channel_order=entry.get("channel_order"),
+        normalization=entry.get("normalization", "rescale"),
+        mean=tuple(float(m) for m in entry["mean"]) if entry.get("mean") else None,
+        scale=tuple(float(s) for s in entry["scale"]) if entry.get("scale") else None,
+    )
+    # Validation au chargement du manifeste plutôt qu'à la première image
+    spec.normalizer()
+    return spec
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str
+    path: str
+    description: str = ""
+    num_threads: object = "auto"
+    xnnpack: bool = True
+    ensemble_weight: float = 1.0
+    preprocessing: PreprocessingSpec = PreprocessingSpec()
+
+    @property
+    def available(self):
+        return os.path.isfile(self.path)
+
+    @cached_property
+    def sha256(self):
+        digest = hashlib.sha256()
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @property
+    def version(self):
+        # Version affichée avec chaque prédiction : début de l'empreinte du fichier
+        return self.sha256[:12]
+
+    @cached_property
+    def fingerprint(self):
+        # Fichier du modèle et prétraitement : change dès que l'un des deux change
+        return hashlib.sha256(f"{self.sha256}:{self.preprocessing.key}".encode()).hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    return {
+        name: ModelSpec(
+            name=name,
+            path=os.path.join(base_dir, entry["path"]),
+            description=entry.get("description", ""),
+            num_threads=entry.get("num_threads", "auto"),
+            xnnpack=entry.get("xnnpack", True),
+            ensemble_weight=float(entry.get("ensemble_weight", 1.0)),
+            preprocessing=_parse_preprocessing(entry.get("preprocessing")),
+        )
+        for name, entry in entries.items()
+    }
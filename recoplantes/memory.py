@@ -0,0 +1,38 @@
+"""
+Mesures mémoire du processus courant.
+
+`memory_breakdown` distingue, à partir de `/proc/<pid>/smaps_rollup`, la
+mémoire propre au processus (pages privées) de celle partagée avec d'autres
+processus (pages des modèles chargées avant le fork des workers, bibliothèques).
+"""
+
+import os
+
+
+def current_rss():
+    # RSS courant en octets (Linux), None si indisponible
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def memory_breakdown(pid="self"):
+    # Octets : rss, pss (part proportionnelle), unique (privé) et shared ; None si indisponible
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except (OSError, ValueError):
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "unique": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
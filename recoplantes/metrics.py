@@ -0,0 +1,229 @@
+"""
+Instrumentation légère de la chaîne de prédiction.
+
+`span("decode", model="CNN")` chronomètre une étape et alimente :
+- un histogramme cumulatif au format Prometheus (`reco_stage_seconds`) ;
+- une fenêtre glissante des dernières mesures, exposée en quantiles ;
+- la trace de la requête en cours (détail de la dernière requête).
+
+Les métriques sont servies au format texte Prometheus par un petit serveur
+HTTP local (`RECO_METRICS_PORT`) et/ou écrites périodiquement dans un
+fichier (`RECO_METRICS_FILE`, pour le collecteur textfile de node_exporter).
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from recoplantes.config import get_setting
+
+METRICS_PORT = get_setting("metrics_port", 0, int)
+METRICS_FILE = get_setting("metrics_file", None)
+METRICS_FILE_INTERVAL = get_setting("metrics_file_interval", 15.0, float)
+# Nombre de mesures conservées par série pour les quantiles glissants
+WINDOW_SIZE = get_setting("metrics_window", 1024, int)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_local = threading.local()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+class _Histogram:
+    def __init__(self, window=WINDOW_SIZE):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.window = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.window.append(value)
+
+    def quantiles(self):
+        values = sorted(self.window)
+        if not values:
+            return {}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+
+class RequestTrace:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.spans = []
+
+    def add(self, stage, seconds, labels):
+        self.spans.append((stage, seconds, labels))
+
+    @property
+    def total_ms(self):
+        return 1000 * sum(seconds for stage, seconds, _ in self.spans if stage == self.name)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._collectors = []
+
+    def observe(self, name, seconds, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, help_text)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, help_text)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_collector(self, collector):
+        # collector() -> liste de (nom, type, aide, [(labels, valeur), ...]) évaluée à chaque export
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            collectors = list(self._collectors)
+            help_texts = dict(self._help)
+
+        declared = set()
+
+        def declare(name, metric_type, help_text):
+            if name not in declared:
+                declared.add(name)
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), histogram in histograms:
+            labels = dict(labels)
+            declare(name, "histogram", help_texts.get(name))
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for (name, labels), histogram in histograms:
+            window_name = f"{name}_window"
+            declare(window_name, "summary", f"Quantiles sur les {WINDOW_SIZE} dernières mesures de {name}")
+            for q, value in histogram.quantiles().items():
+                lines.append(f"{window_name}{_format_labels({**dict(labels), 'quantile': str(q)})} {value}")
+        for (name, labels), value in counters:
+            declare(name, "counter", help_texts.get(name))
+            lines.append(f"{name}{_format_labels(dict(labels))} {value}")
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception:
+                continue
+            for name, metric_type, help_text, samples in families:
+                declare(name, metric_type, help_text)
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+@contextmanager
+def span(stage, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        METRICS.observe("reco_stage_seconds", seconds, "Durée des étapes de la chaîne de prédiction",
+                        stage=stage, **labels)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.add(stage, seconds, labels)
+
+
+@contextmanager
+def trace_request(name="request", **labels):
+    # Trace des étapes d'une requête (dans le thread courant), en plus de leurs métriques
+    trace = RequestTrace(name)
+    previous = getattr(_local, "trace", None)
+    _local.trace = trace
+    try:
+        with span(name, **labels):
+            yield trace
+    finally:
+        _local.trace = previous
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port=METRICS_PORT, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_file_writer(path=METRICS_FILE, interval=METRICS_FILE_INTERVAL):
+    def write_loop():
+        while True:
+            tmp_path = f"{path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(METRICS.render())
+                # Remplacement atomique : le collecteur ne lit jamais un fichier partiel
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    thread = threading.Thread(target=write_loop, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_exporters():
+    # Démarre les exports configurés (à appeler une seule fois par processus)
+    exporters = {}
+    if METRICS_PORT:
+        exporters["http"] = start_http_server(METRICS_PORT)
+    if METRICS_FILE:
+        exporters["file"] = start_file_writer(METRICS_FILE)
+    return exporters
@@ -0,0 +1,127 @@
+"""
+Pool borné d'interpréteurs TFLite.
+
+Un `Interpreter` n'est pas utilisable depuis plusieurs threads à la fois
+(set_tensor / invoke / get_tensor partagent les mêmes buffers). Le pool
+prête un interpréteur à une seule session à la fois et en crée de nouveaux
+à la demande, dans la limite de `size`.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeout(RuntimeError):
+    """Aucun interpréteur libre dans le délai imparti."""
+
+
+class InterpreterPool:
+    def __init__(self, factory, size=2, timeout=30.0, name=None):
+        if size < 1:
+            raise ValueError("La taille du pool doit être au moins 1.")
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self._factory = factory
+        # LIFO : on réutilise en priorité l'interpréteur le plus récemment
+        # utilisé, dont les buffers sont encore chauds.
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._max_in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_seconds = 0.0
+
+    def prefill(self, count=1):
+        # Crée `count` interpréteurs d'avance (permet de valider le modèle au chargement)
+        for _ in range(min(count, self.size)):
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                self._idle.put(self._factory())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def _acquire(self, timeout):
+        # Interpréteur libre disponible immédiatement
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        # Sinon, on en crée un nouveau si le pool n'est pas plein
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # Pool plein : on attend qu'un interpréteur soit rendu
+        with self._lock:
+            self._waiting += 1
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(
+                f"Aucun interpréteur disponible pour {self.name or 'le modèle'} après {timeout} s."
+            ) from None
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def acquire(self, timeout=None):
+        # Emprunt explicite, à rendre avec release() (ex. invocation sur un autre thread)
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        interpreter = self._acquire(timeout)
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._max_in_use = max(self._max_in_use, self._in_use)
+            self._wait_seconds += time.perf_counter() - start
+        return interpreter
+
+    def release(self, interpreter):
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(interpreter)
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        interpreter = self.acquire(timeout)
+        try:
+            yield interpreter
+        finally:
+            self.release(interpreter)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._created - self._in_use,
+                "waiting": self._waiting,
+                "max_in_use": self._max_in_use,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": 1000 * self._wait_seconds / self._checkouts if self._checkouts else 0.0,
+            }
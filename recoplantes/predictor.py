@@ -0,0 +1,204 @@
+"""
+Chaîne de prédiction complète, indépendante de l'interface : empreinte de
+l'image, cache, décodage, inférence.
+"""
+
+import io
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import UnidentifiedImageError
+
+from recoplantes.cache import PredictionCache, cache_key, image_digest
+from recoplantes.config import get_setting
+from recoplantes.labels import CLASS_NAMES
+from recoplantes.loader import ModelManager, ModelUnavailable
+from recoplantes.manifest import load_manifest
+from recoplantes.memory import memory_breakdown
+from recoplantes.metrics import METRICS, span
+from recoplantes.preprocessing import decode_image, resize_image
+from recoplantes.tiling import predict_tiles
+
+# Cache des prédictions : nombre d'entrées en mémoire et fichier SQLite optionnel
+CACHE_SIZE = get_setting("cache_size", 1024, int)
+CACHE_PATH = get_setting("cache_path", None)
+
+
+class PreprocessingError(ValueError):
+    """L'image envoyée n'a pas pu être décodée ou est refusée."""
+
+
+def summarize(proba, top_k=3):
+    # Classe prédite, confiance (en %) et meilleures classes alternatives
+    proba = np.asarray(proba)
+    order = np.argsort(proba)[::-1][:top_k]
+    return {
+        "predicted_class": CLASS_NAMES[order[0]],
+        "confidence": round(100 * float(proba[order[0]]), 2),
+        "top_k": [
+            {"class": CLASS_NAMES[i], "confidence": round(100 * float(proba[i]), 2)} for i in order
+        ],
+    }
+
+
+@dataclass
+class Prediction:
+    proba: np.ndarray
+    # Version (empreinte du fichier) du modèle qui a répondu
+    version: str
+    model: str = None
+    cached: bool = False
+    # Modèle demandé, s'il a été remplacé par un modèle plus léger (recoplantes.adaptive)
+    requested: str = None
+
+    @property
+    def downgraded(self):
+        return self.requested is not None and self.requested != self.model
+
+
+class Predictor:
+    def __init__(self, manager, cache=None):
+        self.manager = manager
+        self.cache = cache
+        # Préchauffage éventuel (recoplantes.warmup) et moteurs ayant déjà servi une requête
+        self.warmup = None
+        self._served = weakref.WeakSet()
+        self._served_lock = threading.Lock()
+
+    def _first_request(self, engine):
+        with self._served_lock:
+            if engine in self._served:
+                return False
+            self._served.add(engine)
+            return True
+
+    def _lookup(self, model_name, image_bytes):
+        # (clé du cache, prédiction en cache ou None)
+        spec = self.manager.specs[model_name]
+        with span("cache_lookup", model=model_name):
+            key = cache_key(image_digest(image_bytes), model_name, spec.fingerprint)
+            proba = self.cache.get(key)
+        return key, (Prediction(proba, spec.version, model_name, cached=True) if proba is not None else None)
+
+    def cached(self, model_name, image_bytes):
+        # Prédiction déjà en cache pour ce modèle, sans chargement ni inférence
+        if self.cache is None or not self.manager.is_available(model_name):
+            return None
+        return self._lookup(model_name, image_bytes)[1]
+
+    def predict(self, model_name, image_bytes, timeout=None):
+        if not self.manager.is_available(model_name):
+            raise ModelUnavailable(f"Le modèle {model_name} n'est pas disponible.")
+        spec = self.manager.specs[model_name]
+        key = None
+        if self.cache is not None:
+            key, prediction = self._lookup(model_name, image_bytes)
+            if prediction is not None:
+                return prediction
+
+        with span("model_load", model=model_name):
+            engine = self.manager.get(model_name)
+        target_size = engine.input_shape[:2]
+        try:
+            with span("decode", model=model_name):
+                img = decode_image(io.BytesIO(image_bytes), target_size)
+            with span("resize", model=model_name):
+                image = resize_image(img, target_size)
+        except UnidentifiedImageError:
+            raise PreprocessingError("Format d'image non reconnu.") from None
+        except Exception as e:
+            raise PreprocessingError(str(e)) from e
+        # Attente du micro-batch, invocation et lecture de la sortie
+        first = self._first_request(engine)
+        start = time.perf_counter()
+        with span("inference", model=model_name):
+            proba, version = self.manager.predict(model_name, image, timeout=timeout)
+        if first:
+            warm = self.warmup is not None and self.warmup.is_warm(engine)
+            METRICS.observe("reco_first_inference_seconds", time.perf_counter() - start,
+                            "Inférence de la première requête d'un moteur, préchauffé ou non",
+                            model=model_name, state="warm" if warm else "cold")
+
+        # Modèle remplacé pendant la requête : le résultat ne correspond plus à la clé
+        if key is not None and version == spec.version:
+            self.cache.put(key, proba)
+        return Prediction(proba, version, model_name)
+
+    def predict_proba(self, model_name, image_bytes, timeout=None):
+        return self.predict(model_name, image_bytes, timeout).proba
+
+    def predict_tiled(self, model_name, image_bytes, timeout=None):
+        # Grandes photos : tuiles à la taille du modèle, envoyées ensemble au micro-batching
+        with span("model_load", model=model_name):
+            engine = self.manager.get(model_name)
+        versions = []
+
+        def predict_many(tiles):
+            probas, version = self.manager.predict_many(model_name, tiles, timeout=timeout)
+            versions.append(version)
+            return probas
+
+        try:
+            with span("tiled_inference", model=model_name):
+                result = predict_tiles(predict_many, image_bytes, engine.input_shape[0])
+        except UnidentifiedImageError:
+            raise PreprocessingError("Format d'image non reconnu.") from None
+        except (OSError, ValueError) as e:
+            raise PreprocessingError(str(e)) from e
+        result.version = versions[0]
+        return result
+
+
+def _collect_metrics(predictor):
+    # État des modèles, pools, micro-batching et cache, évalué à chaque export
+    def collect():
+        manager = predictor.manager.stats()
+        engines = predictor.manager.engines()
+        pools = {name: engine.pool.stats() for name, engine in engines.items()}
+        batchers = {name: engine.stats() for name, engine in engines.items()}
+        families = [
+            ("reco_models_loaded", "gauge", "Modèles chargés en mémoire", [({}, len(manager["loaded"]))]),
+            ("reco_models_memory_bytes", "gauge", "Empreinte mémoire estimée par modèle",
+             [({"model": name}, size) for name, size in manager["footprint_bytes"].items()]),
+            ("reco_model_loads_total", "counter", "Chargements de modèles", [({}, manager["loads"])]),
+            ("reco_model_evictions_total", "counter", "Déchargements de modèles", [({}, manager["evictions"])]),
+        ]
+        for key, metric_type, help_text in (
+            ("in_use", "gauge", "Interpréteurs empruntés"),
+            ("created", "gauge", "Interpréteurs créés"),
+            ("waiting", "gauge", "Requêtes en attente d'un interpréteur"),
+            ("timeouts", "counter", "Attentes d'interpréteur expirées"),
+        ):
+            suffix = "_total" if metric_type == "counter" else ""
+            families.append((f"reco_pool_{key}{suffix}", metric_type, help_text,
+                             [({"model": name}, stats[key]) for name, stats in pools.items()]))
+        families.append(("reco_batch_queue_depth", "gauge", "Requêtes en file de micro-batching",
+                         [({"model": name}, stats["queued"]) for name, stats in batchers.items()]))
+        families.append(("reco_batches_total", "counter", "Invocations par lot",
+                         [({"model": name}, stats["batches"]) for name, stats in batchers.items()]))
+        families.append(("reco_batched_images_total", "counter", "Images inférées par lot",
+                         [({"model": name}, stats["images"]) for name, stats in batchers.items()]))
+        memory = memory_breakdown()
+        if memory is not None:
+            # Mémoire propre au processus et partagée avec les autres workers
+            families.append(("reco_process_memory_bytes", "gauge", "Mémoire du processus par type de pages",
+                             [({"kind": kind}, memory[kind]) for kind in ("unique", "shared", "pss")]))
+        if predictor.cache is not None:
+            cache = predictor.cache.stats()
+            families.append(("reco_cache_lookups_total", "counter", "Consultations du cache de prédictions", [
+                ({"result": "memory_hit"}, cache["memory_hits"]),
+                ({"result": "disk_hit"}, cache["disk_hits"]),
+                ({"result": "miss"}, cache["misses"]),
+            ]))
+        return families
+    return collect
+
+
+def build_predictor():
+    # Chaîne complète partagée par l'application Streamlit et le service HTTP
+    predictor = Predictor(ModelManager(load_manifest()), PredictionCache(CACHE_SIZE, CACHE_PATH))
+    METRICS.register_collector(_collect_metrics(predictor))
+    return predictor
@@ -0,0 +1,97 @@
+"""
+Prétraitement des images avant inférence.
+
+Les photos de téléphone (12 à 48 Mpx) ne sont jamais décodées en pleine
+résolution : pour un JPEG, `draft()` demande au décodeur une échelle réduite
+(1/2, 1/4 ou 1/8) qui reste au-dessus de la taille cible, puis `resize()`
+termine en deux temps (réduction entière rapide puis rééchantillonnage).
+L'image reste en uint8 ; la conversion en float32 et la normalisation se
+font en une seule passe, directement dans le buffer d'entrée du modèle.
+
+Chaque modèle déclare sa normalisation dans le manifeste (ordre des canaux,
+moyenne et échelle par canal, ou un préréglage : `rescale` pour x/255, `tf`
+pour [-1, 1], `caffe` pour la soustraction des moyennes BGR de ResNet50).
+Elle est compilée en une table de 256 valeurs par canal : une image uint8 est
+normalisée par simple indexation, sans calcul flottant par pixel.
+"""
+
+import numpy as np
+from PIL import Image
+
+from recoplantes.config import get_setting
+
+SCALE = np.float32(1 / 255)
+# Préréglages (moyenne, échelle) par canal de sortie : sortie = (x - moyenne) * échelle
+NORMALIZATIONS = {
+    "rescale": ((0.0, 0.0, 0.0), (1 / 255, 1 / 255, 1 / 255)),
+    "tf": ((127.5, 127.5, 127.5), (1 / 127.5, 1 / 127.5, 1 / 127.5)),
+    "caffe": ((103.939, 116.779, 123.68), (1.0, 1.0, 1.0)),
+    "none": ((0.0, 0.0, 0.0), (1.0, 1.0, 1.0)),
+}
+# Plafond de pixels accepté (protection contre les « bombes de décompression »)
+MAX_PIXELS = get_setting("max_image_pixels", 64_000_000, int)
+# Marge conservée avant le rééchantillonnage final (qualité équivalente à un resize direct)
+REDUCING_GAP = 2.0
+
+
+class ImageTooLarge(ValueError):
+    """L'image déclare plus de pixels que le plafond autorisé."""
+
+
+def decode_image(source, target_size, max_pixels=MAX_PIXELS):
+    # target_size = (hauteur, largeur) du tenseur d'entrée ; PIL attend (largeur, hauteur)
+    height, width = (int(d) for d in target_size)
+    img = Image.open(source)
+    # Seul l'en-tête est lu à ce stade : on vérifie la taille avant tout décodage
+    if img.width * img.height > max_pixels:
+        raise ImageTooLarge(
+            f"Image trop grande ({img.width}x{img.height} pixels, maximum {max_pixels:,} pixels)."
+        )
+    img.draft("RGB", (int(width * REDUCING_GAP), int(height * REDUCING_GAP)))
+    return img.convert("RGB")
+
+
+def resize_image(img, target_size):
+    height, width = (int(d) for d in target_size)
+    img = img.resize((width, height), Image.BICUBIC, reducing_gap=REDUCING_GAP)
+    return np.asarray(img)
+
+
+def load_image(source, target_size, max_pixels=MAX_PIXELS):
+    return resize_image(decode_image(source, target_size, max_pixels), target_size)
+
+
+class Normalizer:
+    def __init__(self, mean=(0.0, 0.0, 0.0), scale=(1 / 255, 1 / 255, 1 / 255), channel_order="RGB"):
+        # Canal source (dans l'image RGB) de chaque canal de sortie
+        self.channels = tuple("RGB".index(c) for c in channel_order.upper())
+        self.mean = tuple(float(m) for m in mean)
+        self.scale = tuple(float(s) for s in scale)
+        values = np.arange(256, dtype=np.float64)
+        self.lut = np.stack([(values - m) * s for m, s in zip(self.mean, self.scale)]).astype(np.float32)
+        # Même transformation sur les trois canaux, sans permutation : deux opérations scalaires suffisent
+        self.uniform = self.channels == (0, 1, 2) and len(set(self.mean)) == 1 and len(set(self.scale)) == 1
+
+    @classmethod
+    def from_preset(cls, name="rescale", channel_order=None, mean=None, scale=None):
+        if name not in NORMALIZATIONS:
+            raise ValueError(f"Normalisation inconnue : {name} (connues : {', '.join(NORMALIZATIONS)})")
+        preset_mean, preset_scale = NORMALIZATIONS[name]
+        default_order = "BGR" if name == "caffe" else "RGB"
+        return cls(mean or preset_mean, scale or preset_scale, channel_order or default_order)
+
+    def __call__(self, image, out):
+        if image.dtype != np.uint8:
+            # Entrée déjà normalisée par l'appelant
+            out[...] = image
+        elif self.uniform:
+            np.multiply(image, np.float32(self.scale[0]), out=out, dtype=np.float32, casting="unsafe")
+            if self.mean[0]:
+                np.subtract(out, np.float32(self.mean[0] * self.scale[0]), out=out)
+        else:
+            for c, source in enumerate(self.channels):
+                np.take(self.lut[c], image[..., source], out=out[..., c], mode="clip")
+
+
+# Normalisation historique de l'application (x/255, RGB)
+normalize_into = Normalizer()
@@ -0,0 +1,146 @@
+"""
+Rechargement à chaud des modèles TFLite.
+
+Un thread relit le manifeste (`models/manifest.json`) à chaque passage et
+surveille les fichiers qu'il déclare. Quand une entrée change (fichier
+remplacé, nouveau chemin vers un autre checkpoint, options modifiées) ou
+apparaît, il attend qu'elle soit stable d'un passage à l'autre puis compare
+l'empreinte SHA-256 du fichier à la version servie. Si le contenu a changé,
+la nouvelle version est chargée et préchauffée en arrière-plan puis échangée
+d'un coup (`ModelManager.reload`) : les requêtes déjà soumises finissent sur
+l'ancienne version, les suivantes partent sur la nouvelle. Un modèle non
+chargé, ou nouveau, est simplement servi dans sa nouvelle version au prochain
+chargement. Une entrée retirée du manifeste reste servie jusqu'au redémarrage.
+
+Le fichier doit être remplacé par renommage (`mv`, `os.replace`) et non
+réécrit sur place : les interpréteurs de l'ancienne version lisent encore
+l'ancien fichier projeté en mémoire.
+"""
+
+import dataclasses
+import os
+import sys
+import threading
+
+from recoplantes.config import get_setting
+from recoplantes.manifest import MANIFEST_PATH, load_manifest
+from recoplantes.metrics import METRICS
+from recoplantes.warmup import warm_engine
+
+# Période de vérification des fichiers (s, 0 = pas de rechargement à chaud)
+RELOAD_INTERVAL = get_setting("reload_interval", 30.0, float)
+
+
+def _file_state(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def _entry_state(spec):
+    # Options de l'entrée (chemin compris) et état de son fichier
+    return spec, _file_state(spec.path)
+
+
+class ModelWatcher:
+    def __init__(self, predictor, interval=RELOAD_INTERVAL, manifest_path=MANIFEST_PATH):
+        self.predictor = predictor
+        self.interval = interval
+        self.manifest_path = manifest_path
+        self.errors = {}
+        self._seen = {name: _entry_state(spec) for name, spec in predictor.manager.specs.items()}
+        # Entrées modifiées au passage précédent, en attente de stabilité
+        self._changed = {}
+        self._reloads = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="model-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def _read_manifest(self):
+        try:
+            specs = load_manifest(self.manifest_path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Manifeste en cours d'écriture ou invalide : entrées connues, relu au passage suivant
+            with self._lock:
+                self.errors["manifest"] = str(e)
+            return dict(self.predictor.manager.specs)
+        with self._lock:
+            self.errors.pop("manifest", None)
+        return specs
+
+    def check(self):
+        # Un passage : renvoie les modèles rechargés
+        reloaded = []
+        for name, spec in self._read_manifest().items():
+            state = _entry_state(spec)
+            if state == self._seen.get(name):
+                self._changed.pop(name, None)
+                continue
+            if self._changed.get(name) != state:
+                # Copie peut-être en cours : on attend un passage sans changement
+                self._changed[name] = state
+                continue
+            self._changed.pop(name, None)
+            self._seen[name] = state
+            if state[1] is None:
+                continue
+            if self.reload(name, spec):
+                reloaded.append(name)
+        return reloaded
+
+    def reload(self, name, spec):
+        # Nouvelle spécification (empreinte recalculée), chargée seulement si le contenu a changé
+        manager = self.predictor.manager
+        new_spec = dataclasses.replace(spec)
+        current = manager.engines().get(name)
+        if current is not None and current.version == new_spec.version and manager.specs.get(name) == new_spec:
+            return False
+        warmup = self.predictor.warmup
+        prepare = (lambda engine: warmup.warm(name, engine)) if warmup is not None else warm_engine
+        try:
+            engine = manager.reload(new_spec, prepare)
+        except Exception as e:
+            with self._lock:
+                self.errors[name] = str(e)
+            METRICS.inc("reco_model_reload_failures_total", 1, "Rechargements de modèles en échec", model=name)
+            print(f"Rechargement de {name} impossible, ancienne version conservée : {e}", file=sys.stderr)
+            return False
+        with self._lock:
+            self.errors.pop(name, None)
+            if engine is None:
+                # Modèle non chargé ou nouveau : la spécification servira au prochain chargement,
+                # rien n'a été échangé (fichier peut-être seulement touché)
+                return False
+            self._reloads[name] = self._reloads.get(name, 0) + 1
+        METRICS.inc("reco_model_reloads_total", 1, "Modèles rechargés à chaud", model=name)
+        print(f"Modèle {name} : version {new_spec.version} échangée.", file=sys.stderr)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "interval_s": self.interval,
+                "reloads": dict(self._reloads),
+                "errors": dict(self.errors),
+                "pending": list(self._changed),
+            }
+
+
+def start_watcher(predictor, interval=RELOAD_INTERVAL, manifest_path=MANIFEST_PATH):
+    if interval <= 0:
+        return None
+    return ModelWatcher(predictor, interval, manifest_path).start()
@@ -0,0 +1,201 @@
+"""
+Service HTTP asynchrone d'inférence, à côté de l'interface Streamlit.
+
+Routes :
+- `POST /predict?model=CNN` : une image, en corps brut ou en multipart (champ `file`) ;
+- `POST /predict/batch?model=CNN` : plusieurs images en multipart (champ `files`) ;
+  avec `RECO_ADAPTIVE=1`, `deadline_ms` fixe l'échéance de la requête (modèle plus
+  léger si elle ne peut pas être tenue, signalé par `served_by` et `downgraded`) ;
+- `GET /health/live` et `GET /health/ready` : vivacité, puis fin du préchauffage des modèles ;
+- `GET /metrics` : métriques au format texte Prometheus.
+
+Le service réutilise la chaîne de l'application (manifeste, chargement des
+modèles, prétraitement, cache, noms de classes). Le décodage et l'inférence
+sont déportés dans un pool de threads borné ; le nombre de requêtes traitées
+simultanément et leur durée sont limités.
+
+Lancement :
+    python -m recoplantes.service
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from recoplantes.adaptive import build_policy
+from recoplantes.config import get_setting
+from recoplantes.loader import ModelUnavailable
+from recoplantes.metrics import METRICS, span
+from recoplantes.pool import PoolTimeout
+from recoplantes.predictor import PreprocessingError, build_predictor, summarize
+from recoplantes.reload import start_watcher
+from recoplantes.warmup import start_warmup, warmup_names
+
+HOST = get_setting("service_host", "127.0.0.1")
+PORT = get_setting("service_port", 8000, int)
+# Threads de calcul, requêtes simultanées, attente d'une place et durée maximale d'une requête
+WORKERS = get_setting("service_workers", 4, int)
+MAX_CONCURRENCY = get_setting("service_max_concurrency", 16, int)
+QUEUE_TIMEOUT = get_setting("service_queue_timeout", 5.0, float)
+REQUEST_TIMEOUT = get_setting("service_timeout", 30.0, float)
+MAX_BATCH_FILES = get_setting("service_max_batch_files", 64, int)
+DEFAULT_MODEL = get_setting("service_default_model", "CNN")
+
+
+class _Overloaded(Exception):
+    pass
+
+
+def create_app(predictor=None, default_model=DEFAULT_MODEL, workers=WORKERS,
+               max_concurrency=MAX_CONCURRENCY, queue_timeout=QUEUE_TIMEOUT,
+               request_timeout=REQUEST_TIMEOUT):
+    predictor = predictor or build_predictor()
+    policy = build_policy(predictor.manager)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service")
+    # Créé au démarrage pour être rattaché à la boucle asyncio du serveur
+    limits = {}
+
+    @asynccontextmanager
+    async def lifespan(app):
+        limits["semaphore"] = asyncio.Semaphore(max_concurrency)
+        # Chargement et préchauffage hors de la boucle : /health/ready passe à 200 ensuite
+        predictor.warmup = start_warmup(predictor.manager, warmup_names(predictor.manager, first=default_model))
+        watcher = start_watcher(predictor)
+        yield
+        if watcher is not None:
+            watcher.stop()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run_limited(model_name, images, deadline):
+        semaphore = limits["semaphore"]
+        try:
+            await asyncio.wait_for(semaphore.acquire(), queue_timeout)
+        except asyncio.TimeoutError:
+            raise _Overloaded() from None
+        try:
+            # Images soumises ensemble : le micro-batching les regroupe en peu d'invocations
+            loop = asyncio.get_running_loop()
+            tasks = [loop.run_in_executor(executor, predict_one, model_name, data, deadline) for data in images]
+        except BaseException:
+            semaphore.release()
+            raise
+        # La place n'est rendue qu'à la fin de tous les calculs, même après un 504 : un calcul
+        # abandonné occupe encore le pool et doit rester compté dans la limite
+        job = asyncio.gather(*tasks, return_exceptions=True)
+        job.add_done_callback(lambda _: semaphore.release())
+        results = await asyncio.wait_for(asyncio.shield(job), request_timeout)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def predict_one(model_name, image_bytes, deadline):
+        try:
+            with span("request", model=model_name):
+                if policy is not None:
+                    # Sous forte charge, un modèle plus léger peut répondre à la place du modèle demandé
+                    prediction = policy.predict(predictor, model_name, image_bytes, deadline, timeout=request_timeout)
+                else:
+                    prediction = predictor.predict(model_name, image_bytes, timeout=request_timeout)
+        except PreprocessingError as e:
+            return {"error": f"Image invalide : {e}"}
+        # Version et modèle par image : un rechargement ou un déclassement peut intervenir au milieu d'un lot
+        return {
+            **summarize(prediction.proba),
+            "model_version": prediction.version,
+            "served_by": prediction.model,
+            "downgraded": prediction.downgraded,
+        }
+
+    def error(status, message):
+        return JSONResponse({"error": message}, status_code=status)
+
+    async def handle(request, images, batch):
+        model_name = request.query_params.get("model", default_model)
+        if model_name not in predictor.manager.specs:
+            return error(404, f"Modèle inconnu : {model_name}")
+        if not predictor.manager.is_available(model_name):
+            return error(503, f"Le modèle {model_name} n'est pas disponible.")
+        try:
+            deadline = float(request.query_params["deadline_ms"]) / 1000 if "deadline_ms" in request.query_params else None
+        except ValueError:
+            return error(400, "Paramètre deadline_ms invalide.")
+        try:
+            results = await run_limited(model_name, images, deadline)
+        except _Overloaded:
+            return error(503, "Serveur saturé, réessayez plus tard.")
+        except (asyncio.TimeoutError, PoolTimeout):
+            return error(504, "Délai de traitement dépassé.")
+        except ModelUnavailable as e:
+            return error(503, str(e))
+        if batch:
+            return JSONResponse({"model": model_name, "results": results})
+        if "error" in results[0]:
+            return error(400, results[0]["error"])
+        return JSONResponse({"model": model_name, **results[0]})
+
+    async def predict(request):
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                return error(400, "Champ 'file' manquant.")
+            image_bytes = await upload.read()
+        else:
+            image_bytes = await request.body()
+        if not image_bytes:
+            return error(400, "Aucune image reçue.")
+        return await handle(request, [image_bytes], batch=False)
+
+    async def predict_batch(request):
+        form = await request.form(max_files=MAX_BATCH_FILES)
+        uploads = [u for u in form.getlist("files") if not isinstance(u, str)]
+        if not uploads:
+            return error(400, "Champ 'files' manquant.")
+        images = [await upload.read() for upload in uploads]
+        return await handle(request, images, batch=True)
+
+    async def live(request):
+        return JSONResponse({"status": "ok"})
+
+    async def ready(request):
+        warmup = predictor.warmup
+        # Prêt une fois le préchauffage terminé, si le modèle par défaut a pu être chargé
+        is_ready = warmup is not None and warmup.ready and default_model not in warmup.errors
+        body = {
+            "ready": is_ready,
+            "models": {
+                name: "loaded" if predictor.manager.is_loaded(name)
+                else "available" if predictor.manager.is_available(name) else "unavailable"
+                for name in predictor.manager.specs
+            },
+        }
+        if warmup is not None:
+            body["warmup"] = warmup.stats()
+            if default_model in warmup.errors:
+                body["error"] = warmup.errors[default_model]
+        return JSONResponse(body, status_code=200 if is_ready else 503)
+
+    async def metrics(request):
+        return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+    return Starlette(
+        routes=[
+            Route("/predict", predict, methods=["POST"]),
+            Route("/predict/batch", predict_batch, methods=["POST"]),
+            Route("/health/live", live),
+            Route("/health/ready", ready),
+            Route("/metrics", metrics),
+        ],
+        lifespan=lifespan,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(create_app(), host=HOST, port=PORT)
@@ -0,0 +1,85 @@
+"""
+Signature compilée d'un modèle TFLite.
+
+Les index, formes et types des tenseurs d'entrée et de sortie sont lus une
+seule fois. Les entrées sont écrites directement dans le buffer de
+l'interpréteur et les sorties lues au travers de vues `interpreter.tensor()`,
+sans les copies de `set_tensor` / `get_tensor`.
+
+TFLite refuse `invoke()` tant qu'une vue sur ses buffers existe : les vues
+ne sont donc jamais conservées au-delà d'une écriture ou d'une lecture.
+
+Un modèle exporté avec son prétraitement (`recoplantes.export`) déclare une
+entrée uint8 sans paramètres de quantification : l'image est alors copiée
+telle quelle, la normalisation du manifeste n'est pas appliquée.
+"""
+
+import weakref
+
+import numpy as np
+
+from recoplantes.preprocessing import normalize_into
+
+
+class ModelSignature:
+    def __init__(self, interpreter, normalizer=None):
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+        self.input_index = input_details["index"]
+        self.output_index = output_details["index"]
+        self.input_shape = tuple(int(d) for d in input_details["shape"][1:])
+        self.input_dtype = input_details["dtype"]
+        self.output_dtype = output_details["dtype"]
+        self.num_classes = int(output_details["shape"][-1])
+        # Le batch dynamique n'est possible que si la dimension 0 est libre dans le graphe
+        self.dynamic_batch = int(input_details["shape_signature"][0]) == -1
+        # Normalisation propre au modèle (manifeste), x/255 par défaut
+        self.normalizer = normalizer or normalize_into
+        # Prétraitement inclus dans le graphe : entrée uint8 brute (une entrée quantifiée
+        # porte une échelle non nulle et attend des valeurs quantifiées, pas des pixels)
+        scale, _ = input_details["quantization"]
+        self.raw_input = self.input_dtype == np.uint8 and scale == 0.0
+        # Taille de batch allouée par interpréteur (évite de relire les détails à chaque appel)
+        self._batch_sizes = weakref.WeakKeyDictionary()
+
+    def ensure_batch(self, interpreter, batch_size):
+        current = self._batch_sizes.get(interpreter)
+        if current is None:
+            current = int(interpreter.get_input_details()[0]["shape"][0])
+        if current != batch_size:
+            interpreter.resize_tensor_input(self.input_index, (batch_size,) + self.input_shape)
+            interpreter.allocate_tensors()
+        self._batch_sizes[interpreter] = batch_size
+
+    def write_inputs(self, interpreter, images):
+        # Normalisation de chaque image directement dans la ligne du batch
+        view = interpreter.tensor(self.input_index)()
+        for i, image in enumerate(images):
+            if self.raw_input:
+                view[i] = image
+            else:
+                self.normalizer(image, view[i])
+        del view
+
+    def read_outputs(self, interpreter, count):
+        # Seules les lignes utiles sont copiées (le buffer est réutilisé au prochain invoke)
+        view = interpreter.tensor(self.output_index)()
+        rows = [view[i].copy() for i in range(count)]
+        del view
+        return rows
+
+    def infer(self, interpreter, images, batch_size=None):
+        # batch_size > len(images) : les lignes de remplissage gardent des données
+        # périmées, leurs sorties sont ignorées
+        if not self.dynamic_batch:
+            # Graphe à batch fixe : une invocation par image
+            rows = []
+            for image in images:
+                self.write_inputs(interpreter, [image])
+                interpreter.invoke()
+                rows.extend(self.read_outputs(interpreter, 1))
+            return rows
+        self.ensure_batch(interpreter, batch_size or len(images))
+        self.write_inputs(interpreter, images)
+        interpreter.invoke()
+        return self.read_outputs(interpreter, len(images))
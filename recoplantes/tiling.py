@@ -0,0 +1,121 @@
+"""
+Analyse par tuiles des grandes photos (plante entière, rang de culture).
+
+Au lieu de réduire toute la photo à la taille d'entrée du modèle (où une
+lésion ne fait plus que quelques pixels), l'image est ramenée à une
+résolution de travail puis découpée en tuiles de la taille du modèle qui se
+chevauchent. Les tuiles sont des vues `sliding_window_view` (aucune copie)
+envoyées ensemble au micro-batching. Leurs probabilités donnent un verdict
+global (moyenne, ou maximum par classe) et une carte basse résolution du
+score de maladie, superposée à la photo.
+
+Le nombre de tuiles est borné (`RECO_TILE_MAX`) : la résolution de travail
+est choisie pour que la grille ne le dépasse pas.
+"""
+
+import io
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image
+
+from recoplantes.config import get_setting
+from recoplantes.labels import LABELS
+from recoplantes.preprocessing import MAX_PIXELS, ImageTooLarge, decode_image, resize_image
+
+TILE_MAX = get_setting("tile_max", 64, int)
+# Recouvrement entre tuiles voisines (0.5 = une demi-tuile)
+TILE_OVERLAP = get_setting("tile_overlap", 0.5, float)
+TILE_AGGREGATE = get_setting("tile_aggregate", "mean")
+
+# Masque des classes « saines » : le score de maladie d'une tuile est la probabilité restante
+HEALTHY = np.array([info.healthy for info in LABELS.classes])
+
+
+@dataclass
+class TileGrid:
+    rows: int
+    cols: int
+    stride: int
+    height: int
+    width: int
+
+
+@dataclass
+class TiledResult:
+    proba: np.ndarray
+    tile_probas: np.ndarray
+    heatmap: np.ndarray
+    grid: TileGrid
+    version: str = None
+
+
+def plan_grid(width, height, tile, overlap=TILE_OVERLAP, max_tiles=TILE_MAX):
+    # Résolution de travail la plus haute (sans agrandir la photo) dont la grille tient dans max_tiles
+    stride = max(1, int(round(tile * (1 - overlap))))
+    short, long = min(width, height), max(width, height)
+    best_k = max(1, (short - tile) // stride + 1) if short >= tile else 1
+    for k in range(best_k, 0, -1):
+        short_work = tile + (k - 1) * stride
+        long_work = max(tile, int(round(long * short_work / short)))
+        m = (long_work - tile) // stride + 1
+        if k * m <= max_tiles or k == 1:
+            break
+    if k * m > max_tiles:
+        # Photo très allongée : on tasse le grand côté pour rester dans la borne
+        m = max(1, max_tiles // k)
+    # Dimensions ajustées pour que la grille couvre exactement l'image
+    long_work = tile + (m - 1) * stride
+    if width <= height:
+        return TileGrid(rows=m, cols=k, stride=stride, height=long_work, width=short_work)
+    return TileGrid(rows=k, cols=m, stride=stride, height=short_work, width=long_work)
+
+
+def extract_tiles(image, tile, grid):
+    # Vue (rows, cols, tile, tile, C) sur l'image, puis liste de tuiles (vues également)
+    windows = sliding_window_view(image, (tile, tile, image.shape[2]))[::grid.stride, ::grid.stride, 0]
+    return [windows[r, c] for r in range(grid.rows) for c in range(grid.cols)]
+
+
+def aggregate(tile_probas, method=TILE_AGGREGATE):
+    if method == "max":
+        # Une lésion visible sur une seule tuile suffit à faire ressortir sa classe
+        proba = tile_probas.max(axis=0)
+        return proba / proba.sum()
+    return tile_probas.mean(axis=0)
+
+
+def disease_scores(tile_probas):
+    return tile_probas[:, ~HEALTHY].sum(axis=1)
+
+
+def load_tiles(image_bytes, tile, overlap=TILE_OVERLAP, max_tiles=TILE_MAX, max_pixels=MAX_PIXELS):
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        width, height = img.size
+    if width * height > max_pixels:
+        raise ImageTooLarge(f"Image trop grande ({width}x{height} pixels, maximum {max_pixels:,} pixels).")
+    grid = plan_grid(width, height, tile, overlap, max_tiles)
+    image = resize_image(decode_image(io.BytesIO(image_bytes), (grid.height, grid.width), max_pixels),
+                         (grid.height, grid.width))
+    return image, extract_tiles(image, tile, grid), grid
+
+
+def predict_tiles(predict_many, image_bytes, tile, overlap=TILE_OVERLAP, max_tiles=TILE_MAX, method=TILE_AGGREGATE):
+    # predict_many(tuiles) -> probabilités par tuile (micro-batching du modèle)
+    _, tiles, grid = load_tiles(image_bytes, tile, overlap, max_tiles)
+    tile_probas = np.stack(predict_many(tiles))
+    heatmap = disease_scores(tile_probas).reshape(grid.rows, grid.cols)
+    return TiledResult(aggregate(tile_probas, method), tile_probas, heatmap, grid)
+
+
+def heatmap_overlay(image_bytes, heatmap, width=640, alpha=0.45):
+    # Photo réduite à `width` pixels de large, score de maladie en rouge (0 = transparent)
+    img = Image.open(io.BytesIO(image_bytes))
+    img.draft("RGB", (width, width))
+    img = img.convert("RGB")
+    img.thumbnail((width, 10 * width), Image.BILINEAR)
+    scores = Image.fromarray(np.uint8(np.clip(heatmap, 0, 1) * 255), mode="L").resize(img.size, Image.BILINEAR)
+    red = Image.new("RGB", img.size, (220, 30, 30))
+    mask = scores.point(lambda v: int(v * alpha))
+    return Image.composite(red, img, mask)
@@ -0,0 +1,323 @@
+"""
+Inférence dans un processus séparé, images transmises par mémoire partagée.
+
+Chaque modèle chargé tourne dans son propre processus (`RECO_REMOTE_INFERENCE=1`).
+Les images et les probabilités ne transitent pas par les files : elles sont
+écrites dans un anneau de slots `multiprocessing.shared_memory` (une image
+d'entrée et une ligne de probabilités par slot). Seul le numéro du slot passe
+par la file des requêtes, puis par celle des réponses.
+
+Côté interface, un slot libre est réservé avant d'écrire l'image ; si tous les
+slots sont occupés, l'appelant attend puis reçoit `TransportBusy` (même
+traitement qu'un pool d'interpréteurs saturé). Côté worker, l'image est lue
+directement dans le slot et transmise au micro-batching local, qui la copie
+une seule fois dans le tenseur d'entrée de l'interpréteur.
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from recoplantes.batching import EngineClosed
+from recoplantes.memory import memory_breakdown
+from recoplantes.pool import PoolTimeout
+
+# Intervalle de vérification que le worker est toujours vivant
+_POLL_SECONDS = 1.0
+
+
+class TransportBusy(PoolTimeout):
+    """Tous les slots de mémoire partagée sont occupés."""
+
+
+class SlotRing:
+    """Slots d'entrée (images) et de sortie (probabilités) en mémoire partagée."""
+
+    def __init__(self, slots, input_shape, num_classes, dtype=np.uint8, names=None):
+        self.slots = slots
+        self.input_shape = tuple(input_shape)
+        self.num_classes = num_classes
+        self.dtype = np.dtype(dtype)
+        in_bytes = slots * int(np.prod(self.input_shape)) * self.dtype.itemsize
+        out_bytes = slots * num_classes * np.dtype(np.float32).itemsize
+        self._owner = names is None
+        if self._owner:
+            self._in = shared_memory.SharedMemory(create=True, size=in_bytes)
+            self._out = shared_memory.SharedMemory(create=True, size=out_bytes)
+            # Compteurs du worker : batchs, images inférées, durée des invocations (µs) et leur nombre
+            self._counters = shared_memory.SharedMemory(create=True, size=4 * 8)
+        else:
+            self._in, self._out, self._counters = (shared_memory.SharedMemory(name=n) for n in names)
+        self.inputs = np.ndarray((slots,) + self.input_shape, dtype=self.dtype, buffer=self._in.buf)
+        self.outputs = np.ndarray((slots, num_classes), dtype=np.float32, buffer=self._out.buf)
+        self.counters = np.ndarray((4,), dtype=np.int64, buffer=self._counters.buf)
+        if self._owner:
+            self.counters[:] = 0
+
+    def descriptor(self):
+        # Ce qu'il faut au worker pour s'attacher aux mêmes blocs
+        return (self.slots, self.input_shape, self.num_classes, self.dtype.str,
+                (self._in.name, self._out.name, self._counters.name))
+
+    @classmethod
+    def attach(cls, descriptor):
+        slots, input_shape, num_classes, dtype, names = descriptor
+        return cls(slots, input_shape, num_classes, dtype, names)
+
+    @property
+    def nbytes(self):
+        return self._in.size + self._out.size + self._counters.size
+
+    def close(self):
+        # Les vues numpy doivent disparaître avant la fermeture des blocs
+        self.inputs = self.outputs = self.counters = None
+        for block in (self._in, self._out, self._counters):
+            block.close()
+            if self._owner:
+                block.unlink()
+
+
+def _worker_main(spec, build, requests, responses):
+    # Processus d'inférence : moteur local (pool + micro-batching), puis boucle sur les slots
+    try:
+        engine = build(spec)
+    except Exception as e:
+        responses.put(("error", f"{type(e).__name__}: {e}"))
+        return
+    signature = engine.signature
+    responses.put(("ready", signature.input_shape, signature.num_classes, engine.max_batch))
+    ring = SlotRing.attach(requests.get())
+
+    def reply(slot, future):
+        try:
+            ring.outputs[slot] = future.result()
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        stats = engine.stats()
+        ring.counters[:] = (stats["batches"], stats["images"], round(1e6 * stats["invoke_seconds"]), stats["timed_invokes"])
+        responses.put((slot, error))
+
+    try:
+        while True:
+            slot = requests.get()
+            if slot is None:
+                break
+            try:
+                future = engine.submit(ring.inputs[slot])
+            except Exception as e:
+                responses.put((slot, f"{type(e).__name__}: {e}"))
+                continue
+            future.add_done_callback(lambda f, slot=slot: reply(slot, f))
+    finally:
+        engine.close(wait=True)
+        ring.close()
+
+
+class RemoteSignature:
+    """Forme d'entrée et nombre de classes annoncés par le worker."""
+
+    def __init__(self, input_shape, num_classes):
+        self.input_shape = tuple(input_shape)
+        self.num_classes = num_classes
+
+
+class RemoteEngine:
+    """Même interface que `MicroBatcher`, inférence dans un processus dédié."""
+
+    def __init__(self, spec, build, slots=16, timeout=30.0, start_timeout=120.0):
+        self.name = spec.name
+        self.version = spec.version
+        self.timeout = timeout
+        # spawn : pas de fork d'un processus déjà multi-thread (Streamlit, micro-batching)
+        context = multiprocessing.get_context("spawn")
+        self._requests = context.Queue()
+        self._responses = context.Queue()
+        self.process = context.Process(
+            target=_worker_main, args=(spec, build, self._requests, self._responses),
+            name=f"inference-{spec.name}", daemon=True,
+        )
+        self.process.start()
+        try:
+            message = self._responses.get(timeout=start_timeout)
+        except queue.Empty:
+            self.process.terminate()
+            raise RuntimeError(f"Le processus d'inférence de {spec.name} n'a pas démarré.") from None
+        if message[0] == "error":
+            self.process.join()
+            raise RuntimeError(message[1])
+        _, input_shape, num_classes, self.max_batch = message
+
+        self.signature = RemoteSignature(input_shape, num_classes)
+        self.input_shape = self.signature.input_shape
+        self.ring = SlotRing(slots, input_shape, num_classes)
+        self._requests.put(self.ring.descriptor())
+        self.pool = _SlotPool(self)
+
+        self._free = queue.LifoQueue()
+        for slot in range(slots):
+            self._free.put(slot)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._shutdown = False
+        self._waiting = 0
+        self._max_in_use = 0
+        self._acquired = 0
+        self._timeouts = 0
+        self._wait_seconds = 0.0
+        self._dispatcher = threading.Thread(target=self._dispatch, name=f"transport-{self.name}", daemon=True)
+        self._dispatcher.start()
+
+    def _acquire(self, timeout):
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        try:
+            slot = self._free.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise TransportBusy(f"Aucun slot libre pour {self.name} après {timeout} s.") from None
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        with self._lock:
+            self._acquired += 1
+            self._wait_seconds += time.perf_counter() - start
+        return slot
+
+    def submit(self, image_array, timeout=None):
+        image_array = np.asarray(image_array)
+        if image_array.shape == (1,) + self.input_shape:
+            image_array = image_array[0]
+        if image_array.shape != self.input_shape:
+            raise ValueError(
+                f"Forme d'entrée {image_array.shape} incompatible avec le modèle {self.input_shape}."
+            )
+        if self._closed:
+            raise EngineClosed("Le moteur d'inférence est arrêté.")
+        slot = self._acquire(self.timeout if timeout is None else timeout)
+        future = Future()
+        with self._lock:
+            if self._closed:
+                self._free.put(slot)
+                raise EngineClosed("Le moteur d'inférence est arrêté.")
+            self._pending[slot] = future
+            self._max_in_use = max(self._max_in_use, len(self._pending))
+        # Seule copie côté interface : l'image est écrite directement dans le slot
+        self.ring.inputs[slot] = image_array
+        self._requests.put(slot)
+        return future
+
+    def predict(self, image_array, timeout=None):
+        return self.submit(image_array, timeout).result(timeout=timeout)
+
+    def predict_many(self, images, timeout=None):
+        # Les slots se libèrent au fil des réponses : plus d'images que de slots reste possible
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        futures = [
+            self.submit(image, None if deadline is None else max(0.0, deadline - time.perf_counter()))
+            for image in images
+        ]
+        return [
+            future.result(timeout=None if deadline is None else max(0.0, deadline - time.perf_counter()))
+            for future in futures
+        ]
+
+    def _dispatch(self):
+        while True:
+            try:
+                message = self._responses.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    self._fail_pending(EngineClosed(f"Le processus d'inférence de {self.name} s'est arrêté."))
+                    return
+                continue
+            slot, error = message
+            with self._lock:
+                future = self._pending.pop(slot, None)
+            # Ligne copiée avant de rendre le slot, qui peut être réécrit aussitôt
+            row = None if error else self.ring.outputs[slot].copy()
+            self._free.put(slot)
+            if future is None:
+                continue
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(row)
+
+    def _fail_pending(self, error):
+        with self._lock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        # Slots rendus : les appelants en attente d'un slot reçoivent EngineClosed, pas TransportBusy
+        for slot, future in pending.items():
+            self._free.put(slot)
+            future.set_exception(error)
+
+    def close(self):
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = self._closed = True
+        # Les requêtes déjà envoyées sont traitées avant le signal d'arrêt
+        self._requests.put(None)
+        self.process.join(timeout=30)
+        if self.process.is_alive():
+            self.process.terminate()
+        # Le dispatcher lit les dernières réponses puis s'arrête de lui-même, le worker étant terminé.
+        # Rien n'est écrit dans la file des réponses : un worker tué a pu garder son verrou d'écriture.
+        self._dispatcher.join()
+        self._fail_pending(EngineClosed("Le moteur d'inférence est arrêté."))
+        self.ring.close()
+
+    def memory_bytes(self):
+        # Mémoire propre du worker (None si indisponible)
+        usage = memory_breakdown(self.process.pid)
+        return usage["unique"] if usage is not None else None
+
+    def stats(self):
+        batches, images, invoke_us, timed_invokes = (int(v) for v in self.ring.counters)
+        return {
+            "name": self.name,
+            "max_batch": self.max_batch,
+            "queued": len(self._pending),
+            "batches": batches,
+            "images": images,
+            "avg_batch_size": images / batches if batches else 0.0,
+            "invoke_seconds": invoke_us / 1e6,
+            "timed_invokes": timed_invokes,
+            "pid": self.process.pid,
+        }
+
+
+class _SlotPool:
+    # Statistiques des slots présentées comme celles d'un pool d'interpréteurs
+    def __init__(self, engine):
+        self._engine = engine
+        self.name = engine.name
+        self.size = engine.ring.slots
+
+    def stats(self):
+        engine = self._engine
+        with engine._lock:
+            in_use = len(engine._pending)
+            return {
+                "name": self.name,
+                "size": self.size,
+                # Un seul interpréteur « vu » de l'interface : l'empreinte est mesurée sur le worker
+                "created": 1,
+                "in_use": in_use,
+                "idle": self.size - in_use,
+                "waiting": engine._waiting,
+                "max_in_use": engine._max_in_use,
+                "checkouts": engine._acquired,
+                "timeouts": engine._timeouts,
+                "avg_wait_ms": 1000 * engine._wait_seconds / engine._acquired if engine._acquired else 0.0,
+            }
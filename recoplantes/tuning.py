@@ -0,0 +1,137 @@
+"""
+Sonde de réglage du nombre de threads TFLite.
+
+Pour un modèle en `num_threads: "auto"`, on chronomètre quelques invocations
+à chaud pour 1, 2, 4... threads jusqu'au nombre de cœurs de la machine et on
+retient le plus rapide. Le choix est enregistré (clé : empreinte du modèle,
+XNNPACK, machine) pour que les démarrages suivants sautent la sonde. Les
+interpréteurs d'un pool tournant en parallèle, le choix n'est borné qu'à la
+construction du pool (`recoplantes.loader.plan_pool`).
+
+La sonde tourne hors du chemin des requêtes : au préchauffage, avant le fork
+des workers, via `python -m recoplantes.tuning`, ou en arrière-plan au premier
+chargement d'un modèle pas encore réglé (le réglage sert alors à partir du
+chargement suivant).
+"""
+
+import json
+import os
+import platform
+import statistics
+import threading
+import time
+
+import numpy as np
+
+from recoplantes.config import get_setting
+from recoplantes.interpreter import create_interpreter
+
+TUNING_FILE = get_setting(
+    "tuning_file",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "tuning.json"),
+)
+PROBE_INVOKES = get_setting("tuning_invokes", 5, int)
+# Un réglage plus économe en threads est préféré s'il reste à moins de 5 % du meilleur
+TOLERANCE = 0.05
+
+_lock = threading.Lock()
+
+
+def host_key():
+    return f"{platform.machine()}-{os.cpu_count()}cpu"
+
+
+def candidate_threads(cpu_count=None):
+    cpu_count = cpu_count or os.cpu_count() or 1
+    candidates = []
+    n = 1
+    while n < cpu_count:
+        candidates.append(n)
+        n *= 2
+    candidates.append(cpu_count)
+    return candidates
+
+
+def time_invokes(interpreter, invokes=PROBE_INVOKES):
+    input_details = interpreter.get_input_details()[0]
+    interpreter.set_tensor(
+        input_details["index"], np.zeros(input_details["shape"], dtype=input_details["dtype"])
+    )
+    # Première invocation à froid (préparation XNNPACK), non chronométrée
+    interpreter.invoke()
+    timings = []
+    for _ in range(invokes):
+        start = time.perf_counter()
+        interpreter.invoke()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def probe_num_threads(model_path, xnnpack=True, candidates=None, invokes=PROBE_INVOKES):
+    timings = {}
+    for num_threads in candidates or candidate_threads():
+        interpreter = create_interpreter(model_path, num_threads=num_threads, xnnpack=xnnpack)
+        timings[num_threads] = time_invokes(interpreter, invokes)
+        del interpreter
+    best = min(timings.values())
+    chosen = min(n for n, t in timings.items() if t <= best * (1 + TOLERANCE))
+    return chosen, timings
+
+
+def _load_store(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def resolve_num_threads(spec, path=TUNING_FILE, probe=True):
+    # probe=False : réglage enregistré seulement, None s'il n'y en a pas encore
+    if spec.num_threads != "auto":
+        return spec.num_threads
+    key = f"{spec.sha256}:{'xnnpack' if spec.xnnpack else 'builtin'}:{host_key()}"
+    with _lock:
+        store = _load_store(path)
+        if key in store:
+            return store[key]["num_threads"]
+        if not probe:
+            return None
+        chosen, timings = probe_num_threads(spec.path, xnnpack=spec.xnnpack)
+        store[key] = {
+            "model": os.path.basename(spec.path),
+            "num_threads": chosen,
+            "timings_ms": {str(n): round(1000 * t, 3) for n, t in timings.items()},
+        }
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(store, f, indent=4)
+        except OSError:
+            # Dossier en lecture seule : la sonde sera refaite au prochain démarrage
+            pass
+    return chosen
+
+
+_probing = set()
+
+
+def probe_in_background(spec, path=TUNING_FILE):
+    # Sonde lancée une seule fois par modèle, sans bloquer le chargement en cours
+    with _lock:
+        if spec.sha256 in _probing:
+            return
+        _probing.add(spec.sha256)
+    threading.Thread(target=resolve_num_threads, args=(spec, path), name=f"tuning-{spec.name}", daemon=True).start()
+
+
+if __name__ == "__main__":
+    # Réglage anticipé de tous les modèles disponibles (ex. au déploiement)
+    from recoplantes.loader import plan_pool
+    from recoplantes.manifest import load_manifest
+
+    for spec in load_manifest().values():
+        if spec.available:
+            num_threads, pool_size = plan_pool(resolve_num_threads(spec))
+            print(f"{spec.name} : num_threads = {num_threads}, pool de {pool_size} interpréteurs")
+        else:
+            print(f"{spec.name} : indisponible")
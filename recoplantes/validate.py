@@ -0,0 +1,138 @@
+"""
+Validation d'un artefact TFLite face au modèle Keras dont il est issu.
+
+Les deux modèles sont exécutés côte à côte sur un jeu d'images fixe
+(`test_images/` et un échantillon stratifié de `Data/color_split_light/test`).
+Le rapport donne l'accord top-1, la dérive maximale des probabilités, la
+latence de chacun et leur rapport ; la commande se termine avec le code 1
+si un seuil est franchi, pour servir de garde-fou avant de déposer un
+nouveau .tflite dans `models/`.
+
+Exemple (TensorFlow requis, depuis la racine du dépôt) :
+    python -m recoplantes.validate model_resnet_v7_best.keras --model ResNet50
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import tensorflow as tf
+
+from recoplantes.evaluation import (
+    accuracy, keras_predict, latency_summary, load_images, stratified_sample, tflite_input_size, tflite_predict,
+    unlabeled_images,
+)
+from recoplantes.manifest import load_manifest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def compare(keras_probas, tflite_probas):
+    agreement = float(np.mean(np.argmax(keras_probas, axis=1) == np.argmax(tflite_probas, axis=1)))
+    drift = np.abs(keras_probas - tflite_probas).max(axis=1)
+    return agreement, float(drift.max()), int(np.argmax(drift))
+
+
+def check_thresholds(result, min_agreement, max_drift, max_latency_ratio, max_slowdown=None):
+    failures = []
+    if result["top1_agreement"] < min_agreement:
+        failures.append(f"accord top-1 {result['top1_agreement']:.2%} < {min_agreement:.2%}")
+    if result["max_probability_drift"] > max_drift:
+        failures.append(f"dérive maximale {result['max_probability_drift']:.4f} > {max_drift:.4f}")
+    if max_latency_ratio and result["latency_ratio"] > max_latency_ratio:
+        failures.append(f"rapport de latence {result['latency_ratio']:.2f} > {max_latency_ratio:.2f}")
+    if max_slowdown and result.get("baseline_slowdown") is not None and result["baseline_slowdown"] > max_slowdown:
+        failures.append(f"ralentissement {result['baseline_slowdown']:.2f}x par rapport à la référence > {max_slowdown:.2f}x")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare un modèle TFLite au modèle Keras d'origine (accord, dérive, latence).")
+    parser.add_argument("keras_model", help="Fichier .keras ou .h5 de référence")
+    parser.add_argument("--model", required=True, help="Nom du modèle dans models/manifest.json")
+    parser.add_argument("--tflite", help="Artefact à valider (défaut : chemin du manifeste)")
+    parser.add_argument("--images", default=os.path.join(ROOT_DIR, "test_images"), help="Dossier d'images fixes")
+    parser.add_argument("--data", default=os.path.join(ROOT_DIR, "Data", "color_split_light"),
+                        help="Jeu découpé dont le split test est échantillonné")
+    parser.add_argument("--per-class", type=int, default=2, help="Images du split test par classe (0 = aucune)")
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Accord top-1 minimal (défaut : 0.98)")
+    parser.add_argument("--max-drift", type=float, default=0.05, help="Écart maximal d'une probabilité (défaut : 0.05)")
+    parser.add_argument("--max-latency-ratio", type=float, default=1.0,
+                        help="Latence TFLite / Keras maximale (défaut : 1.0, 0 = pas de contrôle)")
+    parser.add_argument("--baseline", help="Rapport d'une validation précédente : contrôle du ralentissement")
+    parser.add_argument("--max-slowdown", type=float, default=1.2,
+                        help="Latence TFLite / latence de la référence maximale (défaut : 1.2)")
+    parser.add_argument("--threads", type=int, default=1, help="Threads TFLite (défaut : 1)")
+    parser.add_argument("--report", help="Rapport JSON (défaut : sortie standard)")
+    args = parser.parse_args(argv)
+
+    spec = load_manifest().get(args.model)
+    if spec is None:
+        parser.error(f"Modèle inconnu : {args.model}")
+    tflite_path = args.tflite or spec.path
+    if not os.path.isfile(tflite_path):
+        parser.error(f"Artefact introuvable : {tflite_path}")
+
+    samples = unlabeled_images(args.images) if os.path.isdir(args.images) else []
+    split_dir = os.path.join(args.data, "test")
+    if args.per_class and os.path.isdir(split_dir):
+        samples += stratified_sample(split_dir, args.per_class)
+    if not samples:
+        parser.error("Aucune image de validation.")
+
+    keras_model = tf.keras.models.load_model(args.keras_model, compile=False)
+    normalizer = spec.preprocessing.normalizer()
+    keras_size = tuple(int(d) for d in keras_model.input_shape[1:3])
+    keras_probas, keras_latencies = keras_predict(keras_model, load_images(samples, keras_size), normalizer)
+    tflite_probas, tflite_latencies = tflite_predict(
+        tflite_path, load_images(samples, tflite_input_size(tflite_path)), normalizer, num_threads=args.threads
+    )
+
+    agreement, max_drift, worst = compare(keras_probas, tflite_probas)
+    keras_latency = latency_summary(keras_latencies)
+    tflite_latency = latency_summary(tflite_latencies)
+    result = {
+        "model": args.model,
+        "keras_model": os.path.abspath(args.keras_model),
+        "tflite": os.path.abspath(tflite_path),
+        "images": len(samples),
+        "top1_agreement": agreement,
+        "max_probability_drift": max_drift,
+        "max_drift_image": samples[worst][0],
+        "keras_latency": keras_latency,
+        "tflite_latency": tflite_latency,
+        "latency_ratio": round(tflite_latency["p50_ms"] / keras_latency["p50_ms"], 3),
+    }
+    labels = [label for _, label in samples if label is not None]
+    if labels:
+        labeled = [i for i, (_, label) in enumerate(samples) if label is not None]
+        result["keras_accuracy"] = accuracy(keras_probas[labeled], labels)
+        result["tflite_accuracy"] = accuracy(tflite_probas[labeled], labels)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        result["baseline_slowdown"] = round(tflite_latency["p50_ms"] / baseline["tflite_latency"]["p50_ms"], 3)
+
+    failures = check_thresholds(result, args.min_agreement, args.max_drift, args.max_latency_ratio,
+                                args.max_slowdown if args.baseline else None)
+    result["passed"] = not failures
+    result["failures"] = failures
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    for failure in failures:
+        print(f"ÉCHEC : {failure}", file=sys.stderr)
+    if not failures:
+        print(f"{os.path.basename(tflite_path)} validé : accord {agreement:.1%}, dérive max {max_drift:.4f}, "
+              f"latence x{result['latency_ratio']:.2f}.", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
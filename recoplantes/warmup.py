@@ -0,0 +1,139 @@
+"""
+Préchauffage des modèles au démarrage.
+
+La première invocation d'un interpréteur paie des coûts uniques (préparation
+XNNPACK, défauts de page sur les poids). Un thread d'arrière-plan exécute
+quelques invocations sur une image vide pour les modèles déjà chargés et le
+modèle servi par défaut (chargé au besoin) ; les autres ne sont chargés
+qu'à leur première sélection, dans le budget mémoire du gestionnaire.
+`RECO_WARMUP_MODELS` fixe explicitement la liste, par exemple tout le
+manifeste. `done` passe à vrai une fois la passe terminée, `ready` seulement
+si au moins un modèle a été préchauffé : un manifeste dont aucun modèle
+n'est disponible ne doit pas être annoncé prêt.
+
+Le prédicteur enregistre ensuite la latence de la première vraie requête de
+chaque moteur, étiquetée `warm` ou `cold` selon que le préchauffage l'avait
+déjà traité (`reco_first_inference_seconds`).
+"""
+
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from recoplantes.config import get_setting
+from recoplantes.loader import tune_threads
+from recoplantes.metrics import METRICS
+
+WARMUP_INVOKES = get_setting("warmup_invokes", 3, int)
+WARMUP_MODELS = get_setting("warmup_models", None)
+
+
+def first_available(manager):
+    # Premier modèle du manifeste dont le fichier est présent (modèle servi par défaut)
+    return next((name for name in manager.specs if manager.is_available(name)), None)
+
+
+def warmup_names(manager, first=None):
+    # RECO_WARMUP_MODELS, sinon les modèles déjà chargés ; `first` (modèle par défaut) en tête
+    if WARMUP_MODELS:
+        names = [name.strip() for name in WARMUP_MODELS.split(",") if name.strip()]
+    else:
+        names = list(manager.engines())
+    if first is not None:
+        names = [first] + [name for name in names if name != first]
+    return names
+
+
+def warm_engine(engine, invokes=WARMUP_INVOKES):
+    # Invocations sur une image noire ; renvoie la durée de chacune (s)
+    dummy = np.zeros(engine.input_shape, dtype=np.uint8)
+    timings = []
+    for _ in range(invokes):
+        start = time.perf_counter()
+        engine.predict(dummy)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+class Warmup:
+    def __init__(self, manager, names=None, invokes=WARMUP_INVOKES):
+        self.manager = manager
+        self.names = list(names) if names is not None else warmup_names(manager)
+        self.invokes = invokes
+        self.errors = {}
+        self.timings = {}
+        self._warm = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="model-warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        try:
+            for name in self.names:
+                try:
+                    if self.manager.is_available(name) and not self.manager.is_loaded(name):
+                        # Sonde de threads avant le chargement, pas pendant la première requête
+                        tune_threads(self.manager.specs[name])
+                    self.warm(name, self.manager.get(name))
+                except Exception as e:
+                    self.errors[name] = str(e)
+        finally:
+            self._done.set()
+
+    def warm(self, name, engine):
+        # Aussi utilisé pour une nouvelle version avant son échange (recoplantes.reload)
+        timings = warm_engine(engine, self.invokes)
+        with self._lock:
+            self.timings[name] = timings
+            self.errors.pop(name, None)
+            if timings:
+                self._warm.add(engine)
+        if timings:
+            METRICS.observe("reco_warmup_first_invoke_seconds", timings[0],
+                            "Durée de la première invocation de préchauffage", model=name)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def ready(self):
+        # Modèles chargés et préchauffés sans erreur (même avec RECO_WARMUP_INVOKES=0)
+        with self._lock:
+            warmed = bool(self.timings)
+        return self.done and warmed
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def is_warm(self, engine):
+        with self._lock:
+            return engine in self._warm
+
+    def stats(self):
+        ready = self.ready
+        with self._lock:
+            return {
+                "done": self.done,
+                "ready": ready,
+                "models": list(self.names),
+                "warmed": [name for name in self.names if name in self.timings],
+                "errors": dict(self.errors),
+                "invoke_ms": {name: [round(1000 * t, 3) for t in timings] for name, timings in self.timings.items()},
+            }
+
+    def collect(self):
+        return [("reco_ready", "gauge", "Préchauffage des modèles terminé", [({}, int(self.ready))])]
+
+
+def start_warmup(manager, names=None, invokes=WARMUP_INVOKES):
+    warmup = Warmup(manager, names, invokes)
+    METRICS.register_collector(warmup.collect)
+    return warmup.start()
@@ -0,0 +1,175 @@
+"""
+Service HTTP en plusieurs processus pré-forkés, modèles partagés.
+
+Le processus parent ouvre la socket d'écoute, construit un interpréteur par
+modèle (fichier `.tflite` projeté en mémoire en lecture seule par TFLite,
+poids préparés par XNNPACK) puis crée les workers par `fork()`. Ces pages ne
+sont jamais réécrites : elles restent partagées en copie sur écriture, et
+chaque worker n'ajoute que ses propres buffers d'activations. Un worker qui
+s'arrête est relancé ; s'il s'arrête peu après son démarrage, la relance est
+retardée (1 s, 2 s, 4 s... jusqu'à une minute) et le service s'arrête après
+`RECO_WORKER_MAX_RESTARTS` échecs rapides consécutifs.
+
+Le parent journalise périodiquement, pour chaque worker, la mémoire propre
+(pages privées) et la mémoire partagée, lues dans `/proc/<pid>/smaps_rollup`.
+
+Lancement (Linux) :
+    RECO_WORKER_PROCESSES=4 python -m recoplantes.workers
+"""
+
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+from recoplantes.config import get_setting
+from recoplantes.loader import preload_interpreters, tune_threads
+from recoplantes.manifest import load_manifest
+from recoplantes.memory import memory_breakdown
+from recoplantes.service import HOST, PORT, create_app
+
+PROCESSES = get_setting("worker_processes", 2, int)
+# Modèles chargés avant le fork, séparés par des virgules (défaut : tous les modèles disponibles)
+PRELOAD = get_setting("worker_preload", None)
+# Période (s) du rapport mémoire par worker (0 = au démarrage seulement)
+REPORT_INTERVAL = get_setting("worker_report_interval", 300.0, float)
+# Délai avant le premier rapport, le temps que les workers chargent leurs moteurs
+REPORT_DELAY = 10.0
+# Un worker arrêté avant MIN_UPTIME secondes compte comme un échec de démarrage
+MIN_UPTIME = 10.0
+MAX_RESTARTS = get_setting("worker_max_restarts", 5, int)
+MAX_BACKOFF = 60.0
+
+
+def _log(message):
+    print(f"[workers {os.getpid()}] {message}", file=sys.stderr, flush=True)
+
+
+def bind_socket(host=HOST, port=PORT):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload(specs, names=None):
+    # Réglage des threads fait ici, une fois, plutôt que par chaque worker en parallèle
+    names = names or [name for name, spec in specs.items() if spec.available]
+    for name in names:
+        tune_threads(specs[name])
+    return preload_interpreters(specs, names)
+
+
+def _serve(sock):
+    import uvicorn
+
+    # Les workers suivent SIGTERM/SIGINT via uvicorn ; le parent gère la relance
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(create_app(), log_level="warning")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(sock):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _serve(sock)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except BaseException:
+            _log(f"arrêt sur exception :\n{traceback.format_exc()}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def memory_report(pids):
+    # {pid: {"rss", "pss", "unique", "shared"}} pour les workers encore vivants
+    report = {}
+    for pid in pids:
+        usage = memory_breakdown(pid)
+        if usage is not None:
+            report[pid] = usage
+    return report
+
+
+def log_memory_report(pids):
+    report = memory_report(pids)
+    for pid, usage in sorted(report.items()):
+        _log(
+            f"worker {pid} : propre {usage['unique'] / 2**20:.1f} Mo, partagée {usage['shared'] / 2**20:.1f} Mo, "
+            f"PSS {usage['pss'] / 2**20:.1f} Mo"
+        )
+    if report:
+        total_pss = sum(usage["pss"] for usage in report.values())
+        _log(f"total PSS des {len(report)} workers : {total_pss / 2**20:.1f} Mo")
+    return report
+
+
+def run(processes=PROCESSES, host=HOST, port=PORT, preload_names=None):
+    specs = load_manifest()
+    sock = bind_socket(host, port)
+    loaded = preload(specs, preload_names)
+    _log(f"modèles chargés avant le fork : {', '.join(loaded) or 'aucun'} ; {processes} workers sur {host}:{port}")
+
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # pid -> date de démarrage ; relances en attente (dates)
+    workers = {spawn(sock): time.monotonic() for _ in range(processes)}
+    respawns = []
+    failures = 0
+    code = 0
+    next_report = time.monotonic() + REPORT_DELAY
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid in workers:
+            uptime = time.monotonic() - workers.pop(pid)
+            failures = failures + 1 if uptime < MIN_UPTIME else 0
+            if failures > MAX_RESTARTS:
+                _log(f"worker {pid} arrêté (statut {status}) après {uptime:.1f} s : "
+                     f"{failures} échecs de démarrage consécutifs, arrêt du service")
+                code = 1
+                break
+            delay = min(MAX_BACKOFF, 2 ** (failures - 1)) if failures else 0.0
+            _log(f"worker {pid} arrêté (statut {status}) après {uptime:.1f} s, relance dans {delay:.0f} s")
+            respawns.append(time.monotonic() + delay)
+        now = time.monotonic()
+        for due in [due for due in respawns if due <= now]:
+            respawns.remove(due)
+            workers[spawn(sock)] = time.monotonic()
+        if time.monotonic() >= next_report:
+            log_memory_report(workers)
+            next_report = time.monotonic() + REPORT_INTERVAL if REPORT_INTERVAL > 0 else float("inf")
+        time.sleep(0.5)
+
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(run(preload_names=[name.strip() for name in PRELOAD.split(",") if name.strip()] if PRELOAD else None))
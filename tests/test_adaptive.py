@@ -0,0 +1,72 @@
+"""
+Choix du modèle selon la charge : estimation à partir de la durée des
+invocations et de la file courante du moteur.
+"""
+
+import dataclasses
+import time
+
+import numpy as np
+import pytest
+
+from recoplantes.adaptive import LoadPolicy
+from recoplantes.loader import ModelManager
+from recoplantes.manifest import load_manifest
+
+CNN = dataclasses.replace(load_manifest()["CNN"], num_threads=1)
+pytestmark = pytest.mark.skipif(not CNN.available, reason="modèle CNN absent")
+
+
+@pytest.fixture
+def manager():
+    # Même fichier sous deux noms : "Léger" sert de repli à "Lourd"
+    manager = ModelManager({
+        "Léger": dataclasses.replace(CNN, name="Léger"),
+        "Lourd": dataclasses.replace(CNN, name="Lourd"),
+    })
+    yield manager
+    for engine in manager.engines().values():
+        engine.close(wait=True)
+
+
+def run_batches(engine, count):
+    image = np.zeros(engine.input_shape, dtype=np.uint8)
+    for _ in range(count):
+        engine.predict(image, timeout=10)
+
+
+def test_backlog_downgrades_then_recovers(manager):
+    engine = manager.get("Lourd")
+    manager.get("Léger")
+    policy = LoadPolicy(manager, order=["Léger", "Lourd"], deadline_ms=1000, window_seconds=60)
+    # Sans mesure, le modèle demandé est supposé tenir l'échéance
+    assert policy.estimate("Lourd") is None
+    run_batches(engine, 4)
+    per_batch = policy.estimate("Lourd")
+    assert per_batch is not None and per_batch < 1.0
+    assert policy.choose("Lourd") == "Lourd"
+
+    # File courante assez longue pour dépasser l'échéance : déclassement immédiat,
+    # sans attendre de latence mesurée
+    policy.deadline = per_batch * 10
+    image = np.zeros(engine.input_shape, dtype=np.uint8)
+    futures = [engine.submit(image) for _ in range(64 * engine.max_batch)]
+    assert policy.estimate("Lourd") > policy.deadline
+    assert policy.choose("Lourd") == "Léger"
+
+    # File vidée : le modèle demandé redevient éligible sans avoir servi entre-temps
+    for future in futures:
+        future.result(timeout=60)
+    assert policy.estimate("Lourd") <= policy.deadline
+    assert policy.choose("Lourd") == "Lourd"
+
+
+def test_stale_measurements_expire(manager):
+    engine = manager.get("Lourd")
+    policy = LoadPolicy(manager, order=["Léger", "Lourd"], window_seconds=0.2)
+    policy.estimate("Lourd")
+    run_batches(engine, 3)
+    assert policy.estimate("Lourd") is not None
+    # Aucune invocation dans la fenêtre : mesure oubliée, le modèle sera retenté
+    time.sleep(0.3)
+    assert policy.estimate("Lourd") is None
@@ -0,0 +1,83 @@
+"""
+Micro-batching sur le modèle CNN du dépôt : regroupement des requêtes
+concurrentes et routage des sorties vers leurs appelants.
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from recoplantes.batching import EngineClosed, MicroBatcher
+from recoplantes.interpreter import create_interpreter
+from recoplantes.manifest import load_manifest
+from recoplantes.pool import InterpreterPool
+from recoplantes.signature import ModelSignature
+
+CNN = load_manifest()["CNN"]
+pytestmark = pytest.mark.skipif(not CNN.available, reason="modèle CNN absent")
+
+
+def make_engine(pool_size=4, max_batch=8, max_wait=0.2):
+    pool = InterpreterPool(lambda: create_interpreter(CNN.path, num_threads=1), size=pool_size, name="CNN")
+    return MicroBatcher(pool, max_batch=max_batch, max_wait=max_wait, normalizer=CNN.preprocessing.normalizer())
+
+
+def random_images(engine, count):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, size=engine.input_shape, dtype=np.uint8) for _ in range(count)]
+
+
+def reference(images):
+    # Une invocation par image, hors micro-batching
+    interpreter = create_interpreter(CNN.path, num_threads=1)
+    signature = ModelSignature(interpreter, CNN.preprocessing.normalizer())
+    return [signature.infer(interpreter, [image])[0] for image in images]
+
+
+def test_concurrent_submits_share_one_batch():
+    engine = make_engine(pool_size=4)
+    try:
+        images = random_images(engine, 8)
+        results = [None] * len(images)
+        barrier = threading.Barrier(len(images))
+
+        def caller(i):
+            barrier.wait()
+            results[i] = engine.predict(images[i], timeout=10)
+
+        threads = [threading.Thread(target=caller, args=(i,)) for i in range(len(images))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = engine.stats()
+        # Un seul thread forme les batchs : les 8 requêtes partent ensemble malgré les 4 interpréteurs
+        assert stats["images"] == 8
+        assert stats["batches"] == 1
+        # Chaque appelant reçoit la ligne de sa propre image
+        for result, expected in zip(results, reference(images)):
+            np.testing.assert_allclose(result, expected, atol=1e-5)
+    finally:
+        engine.close(wait=True)
+
+
+def test_predict_many_is_batched_and_ordered():
+    engine = make_engine(pool_size=2, max_wait=0.05)
+    try:
+        images = random_images(engine, 5)
+        results = engine.predict_many(images, timeout=10)
+        assert engine.stats()["batches"] == 1
+        for result, expected in zip(results, reference(images)):
+            np.testing.assert_allclose(result, expected, atol=1e-5)
+    finally:
+        engine.close(wait=True)
+
+
+def test_submit_after_close():
+    engine = make_engine()
+    image = random_images(engine, 1)[0]
+    engine.close(wait=True)
+    with pytest.raises(EngineClosed):
+        engine.submit(image)
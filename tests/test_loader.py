@@ -0,0 +1,75 @@
+"""
+Gestionnaire des modèles : nouvelle tentative après l'arrêt d'un moteur et
+rechargement à chaud pendant que des requêtes sont en cours.
+"""
+
+import dataclasses
+import shutil
+
+import numpy as np
+import pytest
+
+from recoplantes.loader import ModelManager
+from recoplantes.manifest import load_manifest
+
+CNN = dataclasses.replace(load_manifest()["CNN"], num_threads=1)
+pytestmark = pytest.mark.skipif(not CNN.available, reason="modèle CNN absent")
+
+
+@pytest.fixture
+def manager():
+    manager = ModelManager({"CNN": CNN})
+    yield manager
+    for engine in manager.engines().values():
+        engine.close(wait=True)
+
+
+def blank(engine):
+    return np.zeros(engine.input_shape, dtype=np.uint8)
+
+
+def test_predict_retries_on_closed_engine(manager):
+    engine = manager.get("CNN")
+    image = blank(engine)
+    # Moteur arrêté entre get() et la soumission (déchargement, rechargement, processus tué)
+    engine.close(wait=True)
+    proba, version = manager.predict("CNN", image)
+    assert proba.shape == (engine.signature.num_classes,)
+    assert version == CNN.version
+    assert manager.get("CNN") is not engine
+    assert manager.stats()["loads"] == 2
+
+
+def test_reload_swaps_engine_and_drains_old_one(manager, tmp_path):
+    path = tmp_path / "cnn.tflite"
+    shutil.copyfile(CNN.path, path)
+    spec = dataclasses.replace(CNN, path=str(path))
+    manager.specs["CNN"] = spec
+    old = manager.get("CNN")
+    image = blank(old)
+    in_flight = [old.submit(image) for _ in range(16)]
+
+    # Nouvelle version du fichier : contenu différent, donc empreinte différente
+    new_path = tmp_path / "cnn_v2.tflite"
+    new_path.write_bytes(path.read_bytes() + b"\0" * 16)
+    new_spec = dataclasses.replace(spec, path=str(new_path))
+    prepared = []
+    new = manager.reload(new_spec, prepare=prepared.append)
+
+    assert new is not old and prepared == [new]
+    assert manager.get("CNN") is new
+    assert new.version == new_spec.version != old.version
+    # Les requêtes déjà soumises se terminent sur l'ancienne version
+    for future in in_flight:
+        assert future.result(timeout=10).shape == (old.signature.num_classes,)
+    assert manager.predict("CNN", image)[1] == new_spec.version
+    assert manager.stats()["reloads"] == 1
+
+
+def test_reload_of_unloaded_model_only_updates_spec(manager, tmp_path):
+    path = tmp_path / "cnn.tflite"
+    path.write_bytes(open(CNN.path, "rb").read() + b"\0" * 8)
+    new_spec = dataclasses.replace(CNN, path=str(path))
+    assert manager.reload(new_spec) is None
+    assert manager.specs["CNN"] is new_spec
+    assert manager.get("CNN").version == new_spec.version
@@ -0,0 +1,46 @@
+"""
+Pool d'interpréteurs : création à la demande et délai d'attente.
+"""
+
+import threading
+
+import pytest
+
+from recoplantes.pool import InterpreterPool, PoolTimeout
+
+
+def test_creates_lazily_up_to_size():
+    created = []
+    pool = InterpreterPool(lambda: created.append(object()) or created[-1], size=2, timeout=0.1)
+    with pool.checkout() as first:
+        with pool.checkout() as second:
+            assert first is not second
+    assert len(created) == 2
+    # Interpréteur rendu réutilisé, pas de nouvelle création
+    with pool.checkout():
+        pass
+    assert len(created) == 2
+    assert pool.stats()["in_use"] == 0
+
+
+def test_checkout_timeout():
+    pool = InterpreterPool(object, size=1, timeout=0.1)
+    with pool.checkout():
+        with pytest.raises(PoolTimeout):
+            with pool.checkout():
+                pass
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["waiting"] == 0
+    assert stats["in_use"] == 0
+
+
+def test_waiter_gets_returned_interpreter():
+    pool = InterpreterPool(object, size=1, timeout=5)
+    interpreter = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    pool.release(interpreter)
+    waiter.join(5)
+    assert got == [interpreter]
@@ -0,0 +1,61 @@
+"""
+Rechargement à chaud : relecture du manifeste, nouveau checkpoint et nouvelle
+entrée détectés par la surveillance.
+"""
+
+import json
+import shutil
+
+import pytest
+
+from recoplantes.loader import ModelManager
+from recoplantes.manifest import load_manifest
+from recoplantes.predictor import Predictor
+from recoplantes.reload import ModelWatcher
+
+CNN = load_manifest()["CNN"]
+pytestmark = pytest.mark.skipif(not CNN.available, reason="modèle CNN absent")
+
+
+def write_manifest(path, entries):
+    # Remplacement par renommage, comme un déploiement
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(entries), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    shutil.copyfile(CNN.path, tmp_path / "cnn_v1.tflite")
+    write_manifest(tmp_path / "manifest.json", {"CNN": {"path": "cnn_v1.tflite", "num_threads": 1}})
+    return tmp_path
+
+
+def test_watcher_picks_up_new_checkpoint_and_new_entry(models_dir):
+    manifest_path = models_dir / "manifest.json"
+    manager = ModelManager(load_manifest(str(manifest_path)))
+    watcher = ModelWatcher(Predictor(manager), interval=0, manifest_path=str(manifest_path))
+    try:
+        old = manager.get("CNN")
+        assert watcher.check() == []
+
+        # Nouveau checkpoint déposé à côté et désigné par le manifeste
+        (models_dir / "cnn_v2.tflite").write_bytes((models_dir / "cnn_v1.tflite").read_bytes() + b"\0" * 16)
+        write_manifest(manifest_path, {
+            "CNN": {"path": "cnn_v2.tflite", "num_threads": 1},
+            "CNN2": {"path": "cnn_v1.tflite", "num_threads": 1},
+        })
+        # Premier passage : changement noté, échange au passage suivant s'il est stable
+        assert watcher.check() == []
+        assert watcher.check() == ["CNN"]
+
+        new = manager.get("CNN")
+        assert new is not old
+        assert new.version == load_manifest(str(manifest_path))["CNN"].version != old.version
+        # Nouvelle entrée enregistrée, chargée à sa première sélection
+        assert manager.is_available("CNN2") and not manager.is_loaded("CNN2")
+        assert manager.get("CNN2").version == old.version
+        assert watcher.check() == []
+    finally:
+        for engine in manager.engines().values():
+            engine.close(wait=True)
@@ -0,0 +1,126 @@
+"""
+Service HTTP testé en processus avec le client de Starlette.
+
+Seul le modèle CNN (fichier présent dans le dépôt) est servi ; un second
+modèle pointe vers un fichier absent pour les réponses 503.
+
+    python -m pytest tests
+"""
+
+import dataclasses
+import os
+import threading
+
+import pytest
+from starlette.testclient import TestClient
+
+from recoplantes.loader import ModelManager
+from recoplantes.manifest import ModelSpec, load_manifest
+from recoplantes.predictor import Predictor
+from recoplantes.service import create_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_PATH = os.path.join(ROOT, "test_images", "apple_scab.jpg")
+
+CNN = load_manifest()["CNN"]
+pytestmark = pytest.mark.skipif(not CNN.available, reason="modèle CNN absent")
+
+
+def make_predictor(predictor_class=Predictor):
+    # Threads fixés : pas de sonde de réglage pendant les tests
+    specs = {
+        "CNN": dataclasses.replace(CNN, num_threads=1),
+        "Absent": ModelSpec(name="Absent", path=os.path.join(ROOT, "models", "absent.tflite")),
+    }
+    return predictor_class(ModelManager(specs))
+
+
+@pytest.fixture
+def image_bytes():
+    with open(IMAGE_PATH, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def client():
+    predictor = make_predictor()
+    with TestClient(create_app(predictor, default_model="CNN")) as client:
+        assert predictor.warmup.wait(60)
+        yield client
+
+
+def test_ready(client):
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] is True
+    assert body["models"] == {"CNN": "loaded", "Absent": "unavailable"}
+    assert client.get("/health/live").status_code == 200
+
+
+def test_not_ready_without_default_model():
+    predictor = make_predictor()
+    with TestClient(create_app(predictor, default_model="Absent")) as client:
+        assert predictor.warmup.wait(60)
+        # Passe terminée sans aucun modèle préchauffé : pas prêt
+        assert predictor.warmup.done and not predictor.warmup.ready
+        response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+
+def test_predict(client, image_bytes):
+    response = client.post("/predict?model=CNN", content=image_bytes)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["model"] == "CNN"
+    assert body["served_by"] == "CNN"
+    assert body["downgraded"] is False
+    assert body["model_version"] == CNN.version
+    assert 0 <= body["confidence"] <= 100
+    assert len(body["top_k"]) == 3
+
+    multipart = client.post("/predict", files={"file": ("photo.jpg", image_bytes, "image/jpeg")})
+    assert multipart.status_code == 200
+    assert multipart.json()["predicted_class"] == body["predicted_class"]
+
+
+def test_predict_batch(client, image_bytes):
+    files = [("files", ("a.jpg", image_bytes, "image/jpeg")), ("files", ("b.txt", b"pas une image", "text/plain"))]
+    response = client.post("/predict/batch?model=CNN", files=files)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert "predicted_class" in results[0]
+    assert "error" in results[1]
+
+
+@pytest.mark.parametrize("url, content, status", [
+    ("/predict?model=CNN", b"", 400),
+    ("/predict?model=CNN", b"pas une image", 400),
+    ("/predict?model=CNN&deadline_ms=vite", b"x", 400),
+    ("/predict?model=Inconnu", b"x", 404),
+    ("/predict?model=Absent", b"x", 503),
+])
+def test_predict_errors(client, url, content, status):
+    response = client.post(url, content=content)
+    assert response.status_code == status
+    assert "error" in response.json()
+
+
+def test_timed_out_job_keeps_its_slot(image_bytes):
+    release = threading.Event()
+
+    class SlowPredictor(Predictor):
+        def predict(self, model_name, image_bytes, timeout=None):
+            release.wait(10)
+            return super().predict(model_name, image_bytes, timeout)
+
+    predictor = make_predictor(SlowPredictor)
+    app = create_app(predictor, default_model="CNN", max_concurrency=1, queue_timeout=0.1, request_timeout=0.2)
+    with TestClient(app) as client:
+        assert predictor.warmup.wait(60)
+        assert client.post("/predict", content=image_bytes).status_code == 504
+        # Le calcul abandonné tourne encore : la seule place reste prise
+        assert client.post("/predict", content=image_bytes).status_code == 503
+        release.set()
+        assert client.post("/predict", content=image_bytes).status_code == 200
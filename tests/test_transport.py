@@ -0,0 +1,70 @@
+"""
+Processus d'inférence séparé : résultats par mémoire partagée et libération
+des slots quand le processus meurt.
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from recoplantes.batching import EngineClosed
+from recoplantes.loader import build_engine
+from recoplantes.manifest import load_manifest
+from recoplantes.transport import RemoteEngine
+
+CNN = load_manifest()["CNN"]
+pytestmark = [
+    pytest.mark.skipif(not CNN.available, reason="modèle CNN absent"),
+    pytest.mark.skipif(not sys.platform.startswith("linux"), reason="signaux POSIX et /proc requis"),
+]
+
+
+@pytest.fixture
+def engine():
+    engine = RemoteEngine(CNN, build_engine, slots=2, timeout=5)
+    yield engine
+    engine.close()
+
+
+def test_predict_and_counters(engine):
+    proba = engine.predict(np.zeros(engine.input_shape, dtype=np.uint8), timeout=30)
+    assert proba.shape == (engine.signature.num_classes,)
+    stats = engine.stats()
+    assert (stats["batches"], stats["images"]) == (1, 1)
+    assert engine.pool.stats()["in_use"] == 0
+
+
+def test_slots_released_when_worker_dies(engine):
+    image = np.zeros(engine.input_shape, dtype=np.uint8)
+    engine.predict(image, timeout=30)
+    # Processus figé : les deux slots restent occupés, un troisième appelant attend
+    os.kill(engine.process.pid, signal.SIGSTOP)
+    pending = [engine.submit(image), engine.submit(image)]
+    outcome = {}
+
+    def waiter():
+        start = time.perf_counter()
+        try:
+            engine.submit(image)
+            outcome["result"] = "ok"
+        except Exception as e:
+            outcome["result"] = type(e)
+        outcome["seconds"] = time.perf_counter() - start
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.2)
+    os.kill(engine.process.pid, signal.SIGKILL)
+    thread.join(10)
+
+    # L'appelant en attente reçoit EngineClosed (nouvelle tentative possible), pas TransportBusy
+    assert outcome["result"] is EngineClosed
+    assert outcome["seconds"] < engine.timeout
+    for future in pending:
+        assert isinstance(future.exception(timeout=10), EngineClosed)
+    assert engine.pool.stats()["in_use"] == 0
@@ -0,0 +1,45 @@
+"""
+Sonde du nombre de threads et dimensionnement du pool d'interpréteurs.
+"""
+
+import dataclasses
+import json
+
+import pytest
+
+from recoplantes.loader import plan_pool
+from recoplantes.manifest import load_manifest
+from recoplantes.tuning import candidate_threads, resolve_num_threads
+
+CNN = load_manifest()["CNN"]
+
+
+@pytest.mark.parametrize("cpu_count, expected", [
+    (1, [1]), (4, [1, 2, 4]), (6, [1, 2, 4, 6]), (16, [1, 2, 4, 8, 16]),
+])
+def test_candidates_compare_several_thread_counts(cpu_count, expected):
+    assert candidate_threads(cpu_count) == expected
+
+
+@pytest.mark.parametrize("num_threads, pool_size, expected", [
+    # Pool non fixé : dimensionné d'après le réglage mesuré
+    (1, None, (1, 8)), (4, None, (4, 2)), (8, None, (8, 1)), (16, None, (16, 1)),
+    # Pool fixé (RECO_POOL_SIZE) : threads bornés à la construction du pool
+    (4, 4, (2, 4)), (4, 16, (1, 16)), (2, 2, (2, 2)),
+])
+def test_plan_pool(num_threads, pool_size, expected):
+    assert plan_pool(num_threads, pool_size, cpu_count=8) == expected
+
+
+@pytest.mark.skipif(not CNN.available, reason="modèle CNN absent")
+def test_probe_result_is_stored(tmp_path):
+    path = tmp_path / "tuning.json"
+    spec = dataclasses.replace(CNN, num_threads="auto")
+    assert resolve_num_threads(spec, str(path), probe=False) is None
+    chosen = resolve_num_threads(spec, str(path))
+    assert chosen in candidate_threads()
+    (entry,) = json.loads(path.read_text()).values()
+    assert entry["num_threads"] == chosen
+    assert set(entry["timings_ms"]) == {str(n) for n in candidate_threads()}
+    # Réglage relu sans nouvelle sonde
+    assert resolve_num_threads(spec, str(path), probe=False) == chosen